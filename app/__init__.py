@@ -4,9 +4,17 @@ from flask_cors import CORS
 from .routes import init_routes
 import os
 from flask_jwt_extended import JWTManager
+from .revocation import revocation_store
+from .uploads import StreamingUploadRequest
+from .json_provider import FastJSONProvider
+from .compression import compress_response
 
 def create_app():
     app = Flask(__name__, static_url_path='/static', static_folder='static')
+    # Profile picture uploads are streamed to disk as they are parsed, see uploads.py
+    app.request_class = StreamingUploadRequest
+    # Encodes Decimal, date, time and datetime from database rows directly, see json_provider.py
+    app.json = FastJSONProvider(app)
 
     # Configure CORS with simpler setup
     CORS(app,
@@ -37,6 +45,14 @@ def create_app():
     # Initialize JWT manager
     jwt = JWTManager(app)
 
+    # Reject revoked tokens; answered from memory, see revocation.py
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return revocation_store.is_revoked(jwt_payload['jti'])
+
+    # Negotiated gzip/brotli for larger JSON and text responses, see compression.py
+    app.after_request(compress_response)
+
     # Initialize your routes
     init_routes(app)
 
@@ -0,0 +1,48 @@
+# auth.py
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from .models import get_user_id_by_email, get_supplier_id_by_email
+
+
+def identity_claims(user_type, userid, supplier_id=None):
+    """
+    Build the additional JWT claims issued at login.
+    :param user_type: User type (e.g. Admin, Supplier, Client)
+    :param userid: ID of the user
+    :param supplier_id: Supplier ID, or None if the user is not a supplier
+    :return: Dict of claims to pass as additional_claims
+    """
+    return {
+        'user_type': user_type,
+        'userid': userid,
+        'supplier_id': supplier_id
+    }
+
+
+def current_user_id():
+    """
+    Get the user ID of the current request from the JWT claims.
+    Tokens issued before the ids were added to the claims fall back to the
+    email lookup, which is memoized in models.identity_cache.
+    """
+    claims = get_jwt()
+    if 'userid' in claims:
+        return claims['userid']
+    return get_user_id_by_email(get_jwt_identity())
+
+
+def current_supplier_id():
+    """
+    Get the supplier ID of the current request from the JWT claims,
+    or None if the current user is not a supplier.
+    Tokens do not expire, so a token issued before the user became a supplier
+    carries None; that and tokens without the claim fall back to the email lookup.
+    """
+    supplier_id = get_jwt().get('supplier_id')
+    if supplier_id is not None:
+        return supplier_id
+    return get_supplier_id_by_email(get_jwt_identity())
+
+
+def current_user_is_admin():
+    """Check the user_type claim of the current request for an admin."""
+    return str(get_jwt().get('user_type') or '').lower() == 'admin'
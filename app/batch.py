@@ -0,0 +1,104 @@
+# batch.py
+import contextvars
+import logging
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, request
+from flask_jwt_extended import jwt_required
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+from .db import db_session
+from .json_provider import json_bytes
+
+logger = logging.getLogger(__name__)
+
+# Endpoints /api/batch may run: the read-only GETs the booking wizard loads together
+BATCH_ENDPOINTS = {
+    'get_packages_route',                  # /created-packages
+    'get_available_venues_route',          # /available-venues
+    'get_available_gown_packages_route',   # /available-gown-packages
+    'get_services_route',                  # /created-services
+    'get_event_types_route',               # /event-types
+    'get_available_suppliers_route'        # /available-suppliers
+}
+MAX_BATCH_REQUESTS = 10
+# Subrequests run at the same time; each one running holds its own database connection
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+
+# Where flask_jwt_extended keeps the verified token of a request
+_JWT_G_ATTRS = ('_jwt_extended_jwt', '_jwt_extended_jwt_header', '_jwt_extended_jwt_user', '_jwt_extended_jwt_location')
+# The wrapper jwt_required() puts around a view, recognised by its code object
+_JWT_REQUIRED_CODE = jwt_required()(lambda: None).__code__
+
+# body is the JSON-encoded response body
+BatchResult = namedtuple('BatchResult', ['path', 'status', 'body'])
+
+
+def resolve_batch_path(path):
+    """
+    :param path: Path of a subrequest, optionally with a query string
+    :return: Its endpoint, or None if it is not in BATCH_ENDPOINTS
+    """
+    if not isinstance(path, str) or not path.startswith('/'):
+        return None
+    adapter = current_app.url_map.bind(request.host)
+    try:
+        endpoint, _ = adapter.match(path.split('?', 1)[0], method='GET')
+    except HTTPException:
+        return None
+    return endpoint if endpoint in BATCH_ENDPOINTS else None
+
+
+def run_batch(paths):
+    """
+    Run GET subrequests of the current request, concurrently and over shared database
+    connections. Must be called from a view that has verified the JWT: the subrequests
+    reuse that verification instead of decoding the token again.
+    :param paths: Paths accepted by resolve_batch_path
+    :return: BatchResult per path, in the same order
+    """
+    app = current_app._get_current_object()
+    jwt_state = {name: g.get(name) for name in _JWT_G_ATTRS}
+    # Bodies are embedded in the batch response, which is compressed as a whole
+    environ_args = {
+        'base_url': request.host_url,
+        'headers': {'Authorization': request.headers.get('Authorization', ''), 'Accept-Encoding': 'identity'}
+    }
+
+    with db_session():
+        if len(paths) == 1:
+            return [_subrequest(app, paths[0], jwt_state, environ_args)]
+        with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(paths)), thread_name_prefix='batch') as pool:
+            # Each subrequest runs in its own copy of this context, which carries the db_session
+            futures = [
+                pool.submit(contextvars.copy_context().run, _subrequest, app, path, jwt_state, environ_args)
+                for path in paths
+            ]
+            return [future.result() for future in futures]
+
+
+def _subrequest(app, path, jwt_state, environ_args):
+    environ = EnvironBuilder(path=path, method='GET', **environ_args).get_environ()
+    with app.app_context(), app.request_context(environ):
+        for name, value in jwt_state.items():
+            setattr(g, name, value)
+        try:
+            if request.routing_exception is not None:
+                raise request.routing_exception
+            view = app.view_functions[request.url_rule.endpoint]
+            if getattr(view, '__code__', None) is _JWT_REQUIRED_CODE:
+                view = view.__wrapped__  # the batch request's token was verified already
+            response = app.make_response(view(**request.view_args))
+        except HTTPException as e:
+            return BatchResult(path, e.code, json_bytes({'message': e.description}))
+        except Exception as e:
+            logger.error(f"Error in batched request {path}: {e}")
+            return BatchResult(path, 500, json_bytes({'message': 'An error occurred'}))
+
+        body = response.get_data()
+        if not response.is_json or not body:
+            body = json_bytes(body.decode('utf-8', 'replace'))
+        return BatchResult(path, response.status_code, body)
@@ -0,0 +1,103 @@
+# cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a fixed time to live.
+    None results are cached too, with their own (usually shorter) TTL, so repeated
+    misses for an unknown key do not hit the database every time.
+    Entries can be tagged (e.g. with a user ID) and dropped together with invalidate_tag.
+    """
+
+    def __init__(self, maxsize=4096, ttl=300, negative_ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, tag)
+        self._tags = {}  # tag -> set of keys
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'expirations': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key, default=_MISSING):
+        """Return the cached value for key, or default if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats['negative_hits' if entry[1] is None else 'hits'] += 1
+            return entry[1]
+
+    def set(self, key, value, tag=None):
+        """Cache value under key, optionally tagging it for group invalidation."""
+        ttl = self.negative_ttl if value is None else self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def get_or_load(self, key, loader, tag_of=None):
+        """
+        Return the cached value for key, calling loader() on a miss.
+        :param tag_of: Optional callable mapping the loaded value to its tag
+        """
+        value = self.get(key)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        self.set(key, value, tag_of(value) if tag_of and value is not None else None)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self._stats['invalidations'] += 1
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['negative_hits'] + self._stats['misses']
+            return dict(
+                self._stats,
+                size=len(self._entries),
+                maxsize=self.maxsize,
+                hit_ratio=round((lookups - self._stats['misses']) / lookups, 4) if lookups else None
+            )
+
+    def _remove(self, key):
+        # Caller must hold the lock
+        _expires_at, _value, tag = self._entries.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -0,0 +1,216 @@
+# compression.py
+import gzip
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+
+from .cache import TTLCache
+from .json_provider import json_bytes
+from .models import get_catalog_version
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are sent as they are; compressing them saves less than the headers cost
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+# Per-request compression trades ratio for CPU; precompressed bodies are encoded once, at the highest levels
+GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'text/html', 'text/plain', 'text/csv', 'text/css', 'application/javascript'
+}
+
+# Precompressed catalog responses, keyed by endpoint, arguments and catalog version
+catalog_response_cache = TTLCache(maxsize=int(os.getenv('CATALOG_RESPONSE_CACHE_SIZE', 256)), ttl=3600, negative_ttl=0)
+
+# After a failed background rebuild of a CatalogSnapshot, wait this long before trying again
+SNAPSHOT_RETRY_SECONDS = 5
+
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(available=None):
+    """
+    Pick the content coding for the current request from its Accept-Encoding header.
+    :param available: Codings to choose from, defaults to every supported one; may be empty
+    :return: 'br', 'gzip' or None for the uncompressed body
+    """
+    if available is None:
+        available = supported_encodings()
+    accept = request.accept_encodings
+    best = None
+    for encoding in available:
+        if accept[encoding] > 0 and (best is None or accept[encoding] > accept[best]):
+            best = encoding
+    return best
+
+
+def compress(data, encoding, best=False):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response):
+    """
+    after_request hook: compress textual bodies above COMPRESS_MIN_SIZE with the best
+    coding the client accepts. Streamed, file and already encoded responses are left alone.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+class PrecompressedPayload:
+    """A response body stored once uncompressed and once per supported coding, with a weak ETag."""
+
+    def __init__(self, data, mimetype, etag):
+        self.mimetype = mimetype
+        self.etag = etag
+        self.bodies = {None: data}
+        if len(data) >= COMPRESS_MIN_SIZE:
+            for encoding in supported_encodings():
+                self.bodies[encoding] = compress(data, encoding, best=True)
+
+    def response(self):
+        """Build the response for the current request: a 304, or the body in the negotiated coding."""
+        if request.if_none_match.contains_weak(self.etag):
+            response = current_app.response_class(status=304)
+        else:
+            encoding = negotiate_encoding([e for e in self.bodies if e is not None])
+            response = current_app.response_class(self.bodies[encoding], mimetype=self.mimetype)
+            if encoding is not None:
+                response.headers['Content-Encoding'] = encoding
+        if len(self.bodies) > 1:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(self.etag, weak=True)
+        # Clients may keep the body but must revalidate; a 304 costs one memory lookup
+        response.cache_control.no_cache = True
+        return response
+
+
+def catalog_cached(view):
+    """
+    Serve a GET view from catalog_response_cache, precompressed, for as long as the
+    catalog version is unchanged. Only for views whose output depends on nothing but
+    the catalog tables and the URL. Non-200 responses are never cached.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET':
+            return view(*args, **kwargs)
+        try:
+            version = get_catalog_version()
+        except Exception as e:
+            logger.error(f"Error reading catalog version: {e}")
+            version = None
+        if version is None:
+            return view(*args, **kwargs)
+
+        key = (request.endpoint, tuple(sorted(kwargs.items())), request.query_string, version)
+        payload = catalog_response_cache.get(key, None)
+        if payload is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            payload = PrecompressedPayload(response.get_data(), response.mimetype, f"catalog-{version}")
+            catalog_response_cache.set(key, payload)
+        return payload.response()
+    return wrapper
+
+
+class CatalogSnapshot:
+    """
+    A JSON document built from the catalog, kept as a PrecompressedPayload for the
+    catalog version it was built at. When the version changes, the previous snapshot
+    is still served while a background thread builds the new one, so requests never
+    wait for a rebuild; only the first request of a process builds synchronously.
+    """
+
+    def __init__(self, name, build):
+        """
+        :param name: Prefix of the ETag, and the name of the rebuild thread
+        :param build: Function returning the document; called without a request context
+        """
+        self.name = name
+        self._build = build
+        self._current = None  # (catalog version, PrecompressedPayload)
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._retry_at = 0
+        self._builds = 0
+        self._failures = 0
+
+    def payload(self):
+        """
+        :return: The PrecompressedPayload to serve, built first if there is none yet
+        """
+        try:
+            version = get_catalog_version()
+        except Exception as e:
+            logger.error(f"Error reading catalog version: {e}")
+            version = None
+
+        current = self._current
+        if current is None:
+            with self._lock:
+                if self._current is None:
+                    self._current = (version, self._make(version))
+                current = self._current
+        elif version is not None and current[0] != version:
+            self._rebuild_in_background(version)
+        return current[1]
+
+    def stats(self):
+        current = self._current
+        return {
+            'version': current[0] if current else None,
+            'bytes': {str(encoding): len(body) for encoding, body in current[1].bodies.items()} if current else {},
+            'builds': self._builds,
+            'failures': self._failures,
+            'rebuilding': self._rebuilding
+        }
+
+    def _make(self, version):
+        document = self._build()
+        self._builds += 1
+        return PrecompressedPayload(json_bytes(document), 'application/json', f"{self.name}-{version}")
+
+    def _rebuild_in_background(self, version):
+        with self._lock:
+            if self._rebuilding or time.monotonic() < self._retry_at:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, args=(version,), name=f"{self.name}-rebuild", daemon=True).start()
+
+    def _rebuild(self, version):
+        try:
+            self._current = (version, self._make(version))
+        except Exception as e:
+            self._failures += 1
+            self._retry_at = time.monotonic() + SNAPSHOT_RETRY_SECONDS
+            logger.error(f"Error rebuilding {self.name} snapshot: {e}")
+        finally:
+            self._rebuilding = False
@@ -2,6 +2,9 @@
 import os
 import pg8000
 import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from urllib.parse import urlparse
 import ssl
 from dotenv import load_dotenv
@@ -11,7 +14,25 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched per round trip by stream_query; bounds what a streamed response holds in memory
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 500))
+
+# The DbSession of the current db_session() block, if any
+_session = ContextVar('db_session', default=None)
+
+
 def get_db_connection():
+    """
+    Open a database connection, or borrow one from the current db_session().
+    Either way the caller closes it when done.
+    """
+    session = _session.get()
+    if session is not None:
+        return session.acquire()
+    return _connect()
+
+
+def _connect():
     DATABASE_URL = os.getenv("DATABASE_URL")
     if not DATABASE_URL:
         raise ValueError("DATABASE_URL environment variable not set")
@@ -47,4 +68,119 @@ def get_db_connection():
 
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def stream_query(query, params=(), chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Run a SELECT through a server-side cursor and yield its rows a chunk at a time.
+    Only one chunk is held in memory, and the first rows are available before the
+    query has produced the rest. The connection stays open until the generator is
+    exhausted or closed.
+    :param query: SELECT statement, with %s placeholders for params
+    :param chunk_size: Rows per FETCH
+    :return: Generator of (columns, rows) pairs; columns are the result column names
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        # pg8000 opens a transaction implicitly; the cursor lives until it ends
+        cursor.execute(f"DECLARE stream_rows NO SCROLL CURSOR FOR {query}", params)
+        while True:
+            cursor.execute(f"FETCH FORWARD {int(chunk_size)} FROM stream_rows")
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            yield [desc[0] for desc in cursor.description], rows
+        cursor.execute("CLOSE stream_rows")
+    finally:
+        # Closing the connection also ends the read-only transaction
+        cursor.close()
+        conn.close()
+
+
+def columnar_rows(cursor, rows):
+    """
+    Lay fetched rows out column by column: {'columns': [...], 'data': {column: [values]}}.
+    Names come from cursor.description, and no per-row dicts are built; in JSON each
+    column name appears once instead of once per row.
+    :param rows: The rows fetched from cursor
+    """
+    columns = [desc[0] for desc in cursor.description]
+    values = [list(column) for column in zip(*rows)] if rows else [[] for _ in columns]
+    return {'columns': columns, 'data': dict(zip(columns, values))}
+
+
+class _SessionConnection:
+    """A connection lent out by a DbSession; close() hands it back instead of closing it."""
+
+    def __init__(self, session, conn):
+        self._session = session
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._session.release(conn)
+
+
+class DbSession:
+    """
+    Connections shared by everything run inside one db_session() block.
+    A caller gets an idle connection or a newly opened one, never one in use,
+    so callers in different threads can query concurrently.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = []
+        self._opened = []
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return _SessionConnection(self, self._idle.pop())
+        conn = _connect()
+        with self._lock:
+            self._opened.append(conn)
+        return _SessionConnection(self, conn)
+
+    def release(self, conn):
+        try:
+            # End whatever transaction the borrower left open, as closing would have
+            conn.rollback()
+        except Exception as e:
+            logger.warning(f"Not reusing database connection: {e}")
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    def close(self):
+        for conn in self._opened:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"Error closing database connection: {e}")
+        self._opened = []
+        self._idle = []
+
+
+@contextmanager
+def db_session():
+    """
+    Share database connections among all get_db_connection() calls inside the block,
+    including calls from threads that run in a copy of its context. Opening a
+    connection costs a TCP and TLS handshake plus authentication, so a block making
+    many short queries pays that once per concurrent caller instead of once per query.
+    The connections are closed when the block exits.
+    """
+    session = DbSession()
+    token = _session.set(session)
+    try:
+        yield session
+    finally:
+        _session.reset(token)
+        session.close()
@@ -0,0 +1,403 @@
+# images.py
+import base64
+import io
+import json
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from urllib.parse import quote
+
+from werkzeug.security import safe_join
+
+from .cache import TTLCache
+from .storage import storage, PROFILE_FOLDER
+
+try:
+    from PIL import Image
+except ImportError:  # resized variants are skipped without Pillow
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Resized copies (local storage only) live in a _variants folder inside each image folder as
+# <name>.w<width>.<format>, next to a <name>.json sidecar describing them
+VARIANTS_FOLDER = '_variants'
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+VARIANT_QUALITY = 82
+# Every format a variant can be written in: the original's (png or jpeg) and webp
+VARIANT_FORMATS = ('png', 'jpeg', 'webp')
+# The sidecar also holds a tiny WebP placeholder, at most this many pixels on its longest side
+PLACEHOLDER_SIZE = 16
+# Bumped whenever the sidecar gains fields, so older sidecars are regenerated
+SIDECAR_VERSION = 2
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+# How long a request waits for a missing variant before falling back to the original
+VARIANT_WAIT_SECONDS = float(os.getenv('IMAGE_VARIANT_WAIT_SECONDS', 2))
+
+# Browser cache lifetime for images whose URL does not change with their content
+IMAGE_MAX_AGE = int(os.getenv('IMAGE_MAX_AGE', 3600))
+# Content-addressed names and ?v= URLs never change, so they can be cached for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# How long a looked-up image (or its absence) is trusted before storage is checked again
+IMAGE_STAT_TTL = float(os.getenv('IMAGE_STAT_TTL', 30))
+
+# Hand the transfer of image bytes to the front proxy instead of the worker:
+# 'x-accel' (nginx X-Accel-Redirect), 'x-sendfile' (Apache/lighttpd X-Sendfile), or off.
+# For nginx, IMAGE_OFFLOAD_PREFIX must be an internal location aliased to the storage root.
+# Only applies to local storage; S3 storage redirects to presigned URLs instead.
+IMAGE_OFFLOAD = os.getenv('IMAGE_OFFLOAD', '').lower()
+IMAGE_OFFLOAD_PREFIX = os.getenv('IMAGE_OFFLOAD_PREFIX', '/_saved/')
+
+# A file touched this recently may be about to gain a reference from a concurrent upload
+GC_GRACE_SECONDS = 60
+
+# Profile images are stored as <sha256>.<ext>; older uploads used profile_<userid>_<timestamp>_<uuid>.<ext>
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+LEGACY_PROFILE_NAME = re.compile(r'^profile_\d+_\d{8}_\d{6}_[0-9a-f]{8}\.[a-z0-9]+$')
+
+stat_cache = TTLCache(maxsize=int(os.getenv('IMAGE_STAT_CACHE_SIZE', 4096)), ttl=IMAGE_STAT_TTL,
+                      negative_ttl=IMAGE_STAT_TTL)
+# Sidecars are keyed by (source path, source mtime), so a replaced image never reads a stale entry
+variant_info_cache = TTLCache(maxsize=int(os.getenv('IMAGE_STAT_CACHE_SIZE', 4096)), ttl=3600, negative_ttl=0)
+
+
+def commit_profile_image(temp_path, digest, extension):
+    """
+    Move a fully written upload to its content-addressed name. Identical uploads share one file.
+    :param temp_path: Temp file in storage.temp_dir(PROFILE_FOLDER) holding the image
+    :param digest: Hex SHA-256 of the image bytes
+    :param extension: Lowercase file extension without the dot
+    :return: Stored filename (<sha256>.<extension>)
+    """
+    filename = f"{digest}.{extension}"
+    storage.put_file(PROFILE_FOLDER, filename, temp_path)
+    stat_cache.invalidate((PROFILE_FOLDER, filename))
+    return filename
+
+
+def remove_profile_image(filename, grace=True):
+    """
+    Delete an unreferenced profile image written by this service.
+    The caller is responsible for checking that no user still references it.
+    :param grace: Keep files modified within GC_GRACE_SECONDS
+    """
+    if not filename or not (CONTENT_ADDRESSED_NAME.match(filename) or LEGACY_PROFILE_NAME.match(filename)):
+        return False
+
+    try:
+        stored = storage.stat(PROFILE_FOLDER, filename)
+        if stored is None:
+            return False
+        if grace and time.time() - stored.mtime < GC_GRACE_SECONDS:
+            return False
+        removed = storage.delete(PROFILE_FOLDER, filename)
+        stat_cache.invalidate((PROFILE_FOLDER, filename))
+        if storage.is_local:
+            _remove_variants(PROFILE_FOLDER, stored)
+        if removed:
+            logger.info(f"Removed unreferenced profile image {filename}")
+        return removed
+    except Exception as e:
+        logger.error(f"Error removing profile image {filename}: {e}")
+        return False
+
+
+def _remove_variants(folder, stored):
+    """Delete the resized variants and sidecar of a removed original and drop their cache entries."""
+    variant_info_cache.invalidate((stored.path, int(stored.mtime)))
+    variants_dir = os.path.join(os.path.dirname(stored.path), VARIANTS_FOLDER)
+    filename = os.path.basename(stored.path)
+    # Variant names are deterministic, so the shared folder is never listed
+    names = [variant_name(filename, width, fmt) for width in VARIANT_WIDTHS for fmt in VARIANT_FORMATS]
+    names.append(os.path.basename(_sidecar_path(stored.path)))
+    for name in names:
+        try:
+            os.remove(os.path.join(variants_dir, name))
+        except FileNotFoundError:
+            pass
+        stat_cache.invalidate((f"{folder}/{VARIANTS_FOLDER}", name))
+
+
+def stat_image(folder, filename):
+    """
+    Look up an image in storage through the stat cache.
+    :return: StoredFile(path, size, mtime), or None if there is no such image
+    """
+    return stat_cache.get_or_load((folder, filename), lambda: storage.stat(folder, filename))
+
+
+def is_immutable_name(filename):
+    """True for names that change whenever the content does (content-addressed uploads)"""
+    return CONTENT_ADDRESSED_NAME.match(os.path.basename(filename)) is not None
+
+
+def image_etag(image):
+    return f"{int(image.mtime * 1000):x}-{image.size:x}"
+
+
+def image_mimetype(image):
+    return mimetypes.guess_type(image.path)[0] or 'application/octet-stream'
+
+
+def offload_headers(image):
+    """
+    Headers that make the front proxy send the image itself, or None when offloading
+    is disabled, storage is not local or the file is outside the storage root.
+    """
+    if not storage.is_local:
+        return None
+    if IMAGE_OFFLOAD == 'x-sendfile':
+        return {'X-Sendfile': image.path}
+    if IMAGE_OFFLOAD == 'x-accel':
+        relative = os.path.relpath(image.path, storage.root)
+        if relative.startswith(os.pardir):
+            return None
+        location = IMAGE_OFFLOAD_PREFIX.rstrip('/') + '/' + quote(relative.replace(os.sep, '/'))
+        return {'X-Accel-Redirect': location}
+    return None
+
+
+def schedule_variants(folder, filename):
+    """Generate the resized variants of an image in the background."""
+    if Image is None or not storage.is_local:
+        return None
+    source = safe_join(storage.folder_path(folder), filename)
+    if source is None or not os.path.isfile(source):
+        return None
+    return _submit(source)
+
+
+def backfill_variants(folder):
+    """
+    Generate the variants and sidecar of every image in folder that has none, or a stale
+    one, waiting for each. For images written before sidecars were created on upload.
+    :return: Tuple (number generated, number that failed)
+    """
+    if Image is None or not storage.is_local:
+        return 0, 0
+    generated = failed = 0
+    try:
+        with os.scandir(storage.folder_path(folder)) as entries:
+            # Dotfiles are upload and variant temp files; the _variants folder is not a regular file
+            sources = [entry.path for entry in entries if entry.is_file() and not entry.name.startswith('.')]
+    except FileNotFoundError:
+        return 0, 0
+    for source in sorted(sources):
+        if read_variant_info(source) is not None:
+            continue
+        try:
+            _submit(source).result()
+            generated += 1
+        except Exception as e:
+            logger.error(f"Error generating variants for {source}: {e}")
+            failed += 1
+    return generated, failed
+
+
+def resolve_variant(folder, image, width, accept_webp=False):
+    """
+    Pick the file to serve for a requested display width: the smallest variant at
+    least that wide, WebP when the client accepts it. Missing variants are generated
+    on the image pool and cached on disk; if that takes longer than
+    VARIANT_WAIT_SECONDS the original is served meanwhile.
+    :param image: StoredFile of the original, from stat_image
+    :return: Tuple (StoredFile to send; True if it is the original standing in for a
+             variant that is not available yet, so the response must not be cached for long)
+    """
+    if Image is None or not storage.is_local:
+        return image, False
+
+    target = next((w for w in VARIANT_WIDTHS if w >= width), None)
+    if target is None:
+        return image, False
+
+    info = load_variant_info(image, wait=True)
+    if info is None:
+        # Still being generated, timed out or failed
+        return image, True
+
+    if target not in info['widths']:
+        # The original is narrower than the requested size
+        return image, False
+    name = variant_name(os.path.basename(image.path), target, 'webp' if accept_webp else info['format'])
+    variant = stat_image(f"{folder}/{VARIANTS_FOLDER}", name)
+    if variant is None:
+        return image, True
+    return variant, False
+
+
+def load_variant_info(image, wait=False, generate=True):
+    """
+    Return the sidecar for an image through the cache, queueing generation when it is
+    missing or stale.
+    :param wait: Wait up to VARIANT_WAIT_SECONDS for the generation to finish
+    :param generate: Queue generation of a missing sidecar; if False only existing ones are read
+    :return: The sidecar dict, or None if it is not available (yet)
+    """
+    if Image is None or not storage.is_local:
+        return None
+    info_key = (image.path, int(image.mtime))
+    info = variant_info_cache.get_or_load(info_key, lambda: read_variant_info(image.path))
+    if info is not None or not generate:
+        return info
+
+    future = _submit(image.path)
+    if not wait:
+        return None
+    try:
+        info = future.result(timeout=VARIANT_WAIT_SECONDS)
+    except FutureTimeoutError:
+        return None
+    except Exception as e:
+        logger.error(f"Error generating variants for {image.path}: {e}")
+        return None
+    variant_info_cache.set(info_key, info)
+    return info
+
+
+def image_manifest(folder, names):
+    """
+    Describe images for progressive loading: pixel size, bytes, available variants
+    and a tiny placeholder, as precomputed in their sidecars. Only existing sidecars
+    are read; images without one (not generated yet) are listed with their byte size only.
+    :return: List of dicts in the order of names; None for names that do not exist
+    """
+    manifest = []
+    for name in names:
+        image = stat_image(folder, name)
+        if image is None:
+            manifest.append(None)
+            continue
+        entry = {'name': name, 'bytes': image.size, 'width': None, 'height': None,
+                 'variants': [], 'placeholder': None, 'color': None}
+        info = load_variant_info(image, generate=False)
+        if info is not None:
+            _fill_manifest_entry(entry, info)
+        manifest.append(entry)
+    return manifest
+
+
+def _fill_manifest_entry(entry, info):
+    entry['width'] = info['width']
+    entry['height'] = info['height']
+    entry['variants'] = [
+        {'width': v['width'], 'height': v['height'], 'formats': [info['format'], 'webp']}
+        for v in info['variants']
+    ]
+    entry['placeholder'] = info['placeholder']
+    entry['color'] = info['color']
+
+
+def variant_name(filename, width, fmt):
+    return f"{filename}.w{width}.{fmt}"
+
+
+def read_variant_info(source):
+    """Read the sidecar written by generate_variants, or None if it is missing or stale."""
+    sidecar = _sidecar_path(source)
+    try:
+        with open(sidecar) as f:
+            info = json.load(f)
+        if info.get('version') != SIDECAR_VERSION or info.get('source_mtime') != int(os.path.getmtime(source)):
+            return None
+        return info
+    except (OSError, ValueError):
+        return None
+
+
+def generate_variants(source):
+    """
+    Write every resized/WebP variant of source that is narrower than the original,
+    then the sidecar describing them, including a tiny inline placeholder and the
+    average colour. Runs in the image process pool.
+    :return: The sidecar dict
+    """
+    variants_dir = os.path.join(os.path.dirname(source), VARIANTS_FOLDER)
+    os.makedirs(variants_dir, exist_ok=True)
+    filename = os.path.basename(source)
+
+    with Image.open(source) as original:
+        original.load()
+        fmt = 'png' if original.format == 'PNG' or original.mode in ('RGBA', 'LA', 'P') else 'jpeg'
+        width, height = original.size
+        widths = [w for w in VARIANT_WIDTHS if w < width]
+        variants = []
+        for target in widths:
+            resized = original.copy()
+            resized.thumbnail((target, round(height * target / width)), Image.LANCZOS)
+            for variant_fmt in (fmt, 'webp'):
+                image = resized if variant_fmt != 'jpeg' or resized.mode == 'RGB' else resized.convert('RGB')
+                _atomic_save(image, os.path.join(variants_dir, variant_name(filename, target, variant_fmt)),
+                             variant_fmt, quality=VARIANT_QUALITY)
+            variants.append({'width': resized.width, 'height': resized.height})
+
+        tiny = original.convert('RGBA')
+        tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BILINEAR)
+        buffer = io.BytesIO()
+        tiny.save(buffer, format='WEBP', quality=40)
+        placeholder = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+        red, green, blue = tiny.convert('RGB').resize((1, 1), Image.BOX).getpixel((0, 0))
+
+    info = {
+        'version': SIDECAR_VERSION,
+        'source_mtime': int(os.path.getmtime(source)),
+        'width': width,
+        'height': height,
+        'format': fmt,
+        'widths': widths,
+        'variants': variants,
+        'placeholder': placeholder,
+        'color': f"#{red:02x}{green:02x}{blue:02x}"
+    }
+    _atomic_write_json(_sidecar_path(source), info)
+    return info
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_pending = {}
+
+
+def _submit(source):
+    # One pool per worker process; a pool inherited through fork is unusable
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+            _pool_pid = os.getpid()
+            _pending.clear()
+        future = _pending.get(source)
+        if future is None:
+            future = _pool.submit(generate_variants, source)
+            _pending[source] = future
+            future.add_done_callback(lambda _f, source=source: _pending.pop(source, None))
+        return future
+
+
+def _sidecar_path(source):
+    return os.path.join(os.path.dirname(source), VARIANTS_FOLDER, os.path.basename(source) + '.json')
+
+
+def _atomic_save(image, path, fmt, **options):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.variant-')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            image.save(temp_file, format=fmt.upper(), **options)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _atomic_write_json(path, data):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.meta-')
+    with os.fdopen(fd, 'w') as temp_file:
+        json.dump(data, temp_file)
+    os.replace(temp_path, path)
@@ -1,71 +1,286 @@
 # models.py
 
-import hashlib
-from .db import get_db_connection
+import base64
+import csv
+import io
+from .db import get_db_connection, stream_query, columnar_rows
+from .cache import TTLCache
+from .images import remove_profile_image
+from .passwords import hash_password, hash_passwords, verify_password, dummy_password_hash, PasswordHasherBusy
 import logging
-from datetime import date, time, datetime
+import os
+from datetime import date, datetime, timedelta
 
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Email -> userid/supplier_id lookups; the mapping practically never changes,
+# so only profile updates and the TTL evict entries. Misses are kept briefly.
+identity_cache = TTLCache(
+    maxsize=int(os.getenv('IDENTITY_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('IDENTITY_CACHE_TTL', 600)),
+    negative_ttl=int(os.getenv('IDENTITY_CACHE_NEGATIVE_TTL', 30))
+)
+
+# The catalog version is read from the database at most once per CATALOG_VERSION_TTL seconds per worker,
+# which bounds how long a cached catalog response can outlive a change
+catalog_version_cache = TTLCache(
+    maxsize=1,
+    ttl=float(os.getenv('CATALOG_VERSION_TTL', 1)),
+    negative_ttl=float(os.getenv('CATALOG_VERSION_TTL', 1))
+)
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
 
 def check_user(identifier, password):
     """
     Checks if the user exists using either email or username.
     :param identifier: email or username of the user
     :param password: plaintext password to verify
-    :return: Tuple (is_valid, user_type)
+    :return: Tuple (is_valid, user_type, userid, supplier_id)
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    hashed_password = hash_password(password)
 
     try:
-        # Check for user by email or username
+        # Check for user by email or username, resolving the ids carried in the JWT claims
         cursor.execute(
-            "SELECT password, user_type FROM users WHERE email = %s OR username = %s",
+            """SELECT u.password, u.user_type, u.userid, s.supplier_id
+               FROM users u
+               LEFT JOIN suppliers s ON u.userid = s.userid
+               WHERE u.email = %s OR u.username = %s""",
             (identifier, identifier)
         )
         user = cursor.fetchone()
-
-        # Ensure user exists and password matches
-        if user and user[0] == hashed_password:
-            return True, user[1]  # Return True and user_type (e.g., admin, staff, client)
-        return False, None
     finally:
+        # Not held while the password is verified, which takes as long as a bcrypt round
         cursor.close()
         conn.close()
 
+    # Unknown users are verified too, so a miss costs as much as a wrong password
+    is_valid, needs_rehash = verify_password(password, user[0] if user else dummy_password_hash())
+    if not user or not is_valid:
+        return False, None, None, None
+
+    # Transparently upgrade legacy SHA-256 and low-cost bcrypt hashes
+    if needs_rehash:
+        new_hash = hash_password(password)
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE users SET password = %s WHERE userid = %s", (new_hash, user[2]))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error upgrading password hash for user {user[2]}: {e}")
+            conn.rollback()
+        finally:
+            cursor.close()
+            conn.close()
+
+    return True, user[1], user[2], user[3]  # user_type (e.g., admin, staff, client), userid, supplier_id
+
 def create_user(first_name, last_name, username, email, contact_number, password, user_type='Client', address=''):
+    """
+    Creates a user in a single INSERT ... ON CONFLICT DO NOTHING statement.
+    :return: Tuple (created, conflict_field) where conflict_field is 'email' or
+             'username' when an existing user already holds that value
+    """
+    # Hash before taking a connection; bcrypt is the slow part of signup
+    hashed_password = hash_password(password)
     conn = get_db_connection()
     cursor = conn.cursor()
-    hashed_password = hash_password(password)
     
     try:
-        # Check if email exists
-        cursor.execute("SELECT email FROM users WHERE email = %s", (email,))
-        if cursor.fetchone():
-            return False  # Email exists
-        
-        # Insert new user
+        # The EXISTS checks read the snapshot from before the insert, so they only
+        # report a match when the insert was skipped because of it
         cursor.execute(
-            """INSERT INTO users (firstname, lastname, username, email, contactnumber, password, user_type, address)
-               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",  # Correct number of placeholders
-            (first_name, last_name, username, email, contact_number, hashed_password, user_type, address)
+            """WITH inserted AS (
+                   INSERT INTO users (firstname, lastname, username, email, contactnumber, password, user_type, address)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                   ON CONFLICT DO NOTHING
+                   RETURNING userid
+               )
+               SELECT (SELECT userid FROM inserted),
+                      EXISTS (SELECT 1 FROM users WHERE email = %s),
+                      EXISTS (SELECT 1 FROM users WHERE username = %s)""",
+            (first_name, last_name, username, email, contact_number, hashed_password, user_type, address,
+             email, username)
         )
+        userid, email_taken, username_taken = cursor.fetchone()
         conn.commit()
-        return True
+
+        if userid is None:
+            # Neither flag is set when a concurrent signup committed after our snapshot
+            return False, 'username' if username_taken and not email_taken else 'email'
+
+        # A lookup before signup may have cached this email as unknown
+        identity_cache.invalidate(('userid', email))
+        identity_cache.invalidate(('supplier_id', email))
+        return True, None
+    finally:
+        cursor.close()
+        conn.close()
+
+def bulk_create_users(users):
+    """
+    Creates many users at once for admin imports. Rows are streamed into a temporary
+    table with COPY and inserted with one INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+    Each user dict takes the same fields as create_user (firstname, lastname, username,
+    email, contactnumber, user_type, address) plus either 'password' or an existing
+    bcrypt 'password_hash'. Rows whose password or password_hash is not a string are
+    not imported and are reported as skipped.
+    :return: Tuple (created_emails, skipped_emails)
+    """
+    valid = [user for user in users if isinstance(user.get('password_hash') or user.get('password'), str)]
+    plain = [user['password'] for user in valid if not user.get('password_hash')]
+    hashed = iter(hash_passwords(plain))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for user in valid:
+        writer.writerow([
+            user.get('firstname'), user.get('lastname'), user.get('username'), user.get('email'),
+            user.get('contactnumber'), user.get('password_hash') or next(hashed),
+            user.get('user_type') or 'Client', user.get('address') or ''
+        ])
+    buffer.seek(0)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            CREATE TEMP TABLE user_import (
+                firstname TEXT, lastname TEXT, username TEXT, email TEXT,
+                contactnumber TEXT, password TEXT, user_type TEXT, address TEXT
+            ) ON COMMIT DROP
+        """)
+        cursor.execute("COPY user_import FROM STDIN WITH (FORMAT csv)", stream=buffer)
+        cursor.execute("""
+            INSERT INTO users (firstname, lastname, username, email, contactnumber, password, user_type, address)
+            SELECT firstname, lastname, username, email, contactnumber, password, user_type, address
+            FROM user_import
+            ON CONFLICT DO NOTHING
+            RETURNING email
+        """)
+        created = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+
+        for email in created:
+            identity_cache.invalidate(('userid', email))
+            identity_cache.invalidate(('supplier_id', email))
+
+        # An email listed twice in the batch is created once; report the other rows as skipped,
+        # along with the invalid ones, in their order in the batch
+        unclaimed = set(created)
+        valid_ids = {id(user) for user in valid}
+        skipped = []
+        for user in users:
+            if id(user) in valid_ids and user.get('email') in unclaimed:
+                unclaimed.discard(user.get('email'))
+            else:
+                skipped.append(user.get('email'))
+        return created, skipped
+    except Exception as e:
+        logger.error(f"Error importing users: {e}")
+        conn.rollback()
+        raise
     finally:
         cursor.close()
         conn.close()
 
 
 
+# Active wishlist packages of one user (the only parameter), one row per package with its items aggregated into arrays
+WISHLIST_QUERY = """
+    WITH outfit_details AS (
+        SELECT 
+            wo.wishlist_id,
+            ARRAY_AGG(
+                ARRAY[
+                    COALESCE(o.outfit_id::text, gpo.outfit_id::text),
+                    COALESCE(o.outfit_name, gpo_outfit.outfit_name),
+                    COALESCE(o.outfit_type, gpo_outfit.outfit_type),
+                    COALESCE(o.outfit_color, gpo_outfit.outfit_color),
+                    COALESCE(o.outfit_desc, gpo_outfit.outfit_desc),
+                    COALESCE(wo.price::text, gpo_outfit.rent_price::text),
+                    COALESCE(o.outfit_img, gpo_outfit.outfit_img),
+                    COALESCE(wo.status, 'Pending'),
+                    COALESCE(wo.remarks, '')
+                ]
+            ) as outfit_details
+        FROM wishlist_outfits wo
+        LEFT JOIN outfits o ON wo.outfit_id = o.outfit_id
+        LEFT JOIN gown_package gp ON wo.gown_package_id = gp.gown_package_id
+        LEFT JOIN gown_package_outfits gpo ON gp.gown_package_id = gpo.gown_package_id
+        LEFT JOIN outfits gpo_outfit ON gpo.outfit_id = gpo_outfit.outfit_id
+        GROUP BY wo.wishlist_id
+    ),
+    supplier_details AS (
+        SELECT 
+            ws.wishlist_id,
+            array_agg(s.supplier_id ORDER BY s.supplier_id) as supplier_ids,
+            array_agg(u.firstname || ' ' || u.lastname ORDER BY s.supplier_id) as supplier_names,
+            array_agg(s.service ORDER BY s.supplier_id) as services,
+            array_agg(ws.price ORDER BY s.supplier_id) as prices,
+            array_agg(ws.status ORDER BY s.supplier_id) as statuses,
+            array_agg(ws.remarks ORDER BY s.supplier_id) as remarks
+        FROM wishlist_suppliers ws
+        JOIN suppliers s ON ws.supplier_id = s.supplier_id
+        JOIN users u ON s.userid = u.userid
+        GROUP BY ws.wishlist_id
+    ),
+    additional_service_details AS (
+        SELECT 
+            was.wishlist_id,
+            array_agg(ads.add_service_id ORDER BY ads.add_service_id) as service_ids,
+            array_agg(ads.add_service_name ORDER BY ads.add_service_id) as service_names,
+            array_agg(ads.add_service_description ORDER BY ads.add_service_id) as service_descriptions,
+            array_agg(was.price ORDER BY ads.add_service_id) as service_prices,
+            array_agg(was.status ORDER BY ads.add_service_id) as service_statuses,
+            array_agg(was.remarks ORDER BY ads.add_service_id) as service_remarks
+        FROM wishlist_additional_services was
+        JOIN additional_services ads ON was.add_service_id = ads.add_service_id
+        GROUP BY was.wishlist_id
+    ),
+    venue_details AS (
+        SELECT 
+            wv.wishlist_id,
+            v.venue_id,
+            v.venue_name,
+            v.location,
+            wv.price as venue_price,
+            v.description as venue_description,
+            v.venue_capacity,
+            wv.status as venue_status,
+            wv.remarks as venue_remarks
+        FROM wishlist_venues wv
+        JOIN venues v ON wv.venue_id = v.venue_id
+    )
+    SELECT 
+        e.events_id, e.event_name, e.event_type, e.event_theme, e.event_color, 
+        e.schedule, e.start_time, e.end_time, e.status as event_status,
+        wp.wishlist_id, wp.package_name, wp.capacity, wp.description as package_description,
+        wp.total_price, wp.additional_capacity_charges, wp.charge_unit, wp.status as package_status,
+        vd.venue_id, vd.venue_name, vd.location, vd.venue_price, vd.venue_description,
+        vd.venue_capacity, vd.venue_status, vd.venue_remarks,
+        gp.gown_package_name, gp.gown_package_price,
+        od.outfit_details,
+        sd.supplier_ids, sd.supplier_names, sd.services, sd.prices as supplier_prices,
+        sd.statuses as supplier_statuses, sd.remarks as supplier_remarks,
+        asd.service_ids, asd.service_names, asd.service_descriptions,
+        asd.service_prices, asd.service_statuses, asd.service_remarks
+    FROM events e
+    JOIN wishlist_packages wp ON e.events_id = wp.events_id
+    LEFT JOIN venue_details vd ON wp.wishlist_id = vd.wishlist_id
+    LEFT JOIN gown_package gp ON wp.gown_package_id = gp.gown_package_id
+    LEFT JOIN outfit_details od ON wp.wishlist_id = od.wishlist_id
+    LEFT JOIN supplier_details sd ON wp.wishlist_id = sd.wishlist_id
+    LEFT JOIN additional_service_details asd ON wp.wishlist_id = asd.wishlist_id
+    WHERE e.userid = %s AND wp.status != 'Cancelled'
+    ORDER BY wp.created_at DESC
+"""
 
 
 def get_user_wishlist(userid):
@@ -73,221 +288,12 @@ def get_user_wishlist(userid):
     cursor = conn.cursor()
 
     try:
-        cursor.execute("""
-            WITH outfit_details AS (
-                SELECT 
-                    wo.wishlist_id,
-                    ARRAY_AGG(
-                        ARRAY[
-                            COALESCE(o.outfit_id::text, gpo.outfit_id::text),
-                            COALESCE(o.outfit_name, gpo_outfit.outfit_name),
-                            COALESCE(o.outfit_type, gpo_outfit.outfit_type),
-                            COALESCE(o.outfit_color, gpo_outfit.outfit_color),
-                            COALESCE(o.outfit_desc, gpo_outfit.outfit_desc),
-                            COALESCE(wo.price::text, gpo_outfit.rent_price::text),
-                            COALESCE(o.outfit_img, gpo_outfit.outfit_img),
-                            COALESCE(wo.status, 'Pending'),
-                            COALESCE(wo.remarks, '')
-                        ]
-                    ) as outfit_details
-                FROM wishlist_outfits wo
-                LEFT JOIN outfits o ON wo.outfit_id = o.outfit_id
-                LEFT JOIN gown_package gp ON wo.gown_package_id = gp.gown_package_id
-                LEFT JOIN gown_package_outfits gpo ON gp.gown_package_id = gpo.gown_package_id
-                LEFT JOIN outfits gpo_outfit ON gpo.outfit_id = gpo_outfit.outfit_id
-                GROUP BY wo.wishlist_id
-            ),
-            supplier_details AS (
-                SELECT 
-                    ws.wishlist_id,
-                    array_agg(s.supplier_id ORDER BY s.supplier_id) as supplier_ids,
-                    array_agg(u.firstname || ' ' || u.lastname ORDER BY s.supplier_id) as supplier_names,
-                    array_agg(s.service ORDER BY s.supplier_id) as services,
-                    array_agg(ws.price ORDER BY s.supplier_id) as prices,
-                    array_agg(ws.status ORDER BY s.supplier_id) as statuses,
-                    array_agg(ws.remarks ORDER BY s.supplier_id) as remarks
-                FROM wishlist_suppliers ws
-                JOIN suppliers s ON ws.supplier_id = s.supplier_id
-                JOIN users u ON s.userid = u.userid
-                GROUP BY ws.wishlist_id
-            ),
-            additional_service_details AS (
-                SELECT 
-                    was.wishlist_id,
-                    array_agg(ads.add_service_id ORDER BY ads.add_service_id) as service_ids,
-                    array_agg(ads.add_service_name ORDER BY ads.add_service_id) as service_names,
-                    array_agg(ads.add_service_description ORDER BY ads.add_service_id) as service_descriptions,
-                    array_agg(was.price ORDER BY ads.add_service_id) as service_prices,
-                    array_agg(was.status ORDER BY ads.add_service_id) as service_statuses,
-                    array_agg(was.remarks ORDER BY ads.add_service_id) as service_remarks
-                FROM wishlist_additional_services was
-                JOIN additional_services ads ON was.add_service_id = ads.add_service_id
-                GROUP BY was.wishlist_id
-            ),
-            venue_details AS (
-                SELECT 
-                    wv.wishlist_id,
-                    v.venue_id,
-                    v.venue_name,
-                    v.location,
-                    wv.price as venue_price,
-                    v.description as venue_description,
-                    v.venue_capacity,
-                    wv.status as venue_status,
-                    wv.remarks as venue_remarks
-                FROM wishlist_venues wv
-                JOIN venues v ON wv.venue_id = v.venue_id
-            )
-            SELECT 
-                e.events_id, e.event_name, e.event_type, e.event_theme, e.event_color, 
-                e.schedule, e.start_time, e.end_time, e.status as event_status,
-                wp.wishlist_id, wp.package_name, wp.capacity, wp.description as package_description,
-                wp.total_price, wp.additional_capacity_charges, wp.charge_unit, wp.status as package_status,
-                vd.venue_id, vd.venue_name, vd.location, vd.venue_price, vd.venue_description,
-                vd.venue_capacity, vd.venue_status, vd.venue_remarks,
-                gp.gown_package_name, gp.gown_package_price,
-                od.outfit_details,
-                sd.supplier_ids, sd.supplier_names, sd.services, sd.prices as supplier_prices,
-                sd.statuses as supplier_statuses, sd.remarks as supplier_remarks,
-                asd.service_ids, asd.service_names, asd.service_descriptions,
-                asd.service_prices, asd.service_statuses, asd.service_remarks
-            FROM events e
-            JOIN wishlist_packages wp ON e.events_id = wp.events_id
-            LEFT JOIN venue_details vd ON wp.wishlist_id = vd.wishlist_id
-            LEFT JOIN gown_package gp ON wp.gown_package_id = gp.gown_package_id
-            LEFT JOIN outfit_details od ON wp.wishlist_id = od.wishlist_id
-            LEFT JOIN supplier_details sd ON wp.wishlist_id = sd.wishlist_id
-            LEFT JOIN additional_service_details asd ON wp.wishlist_id = asd.wishlist_id
-            WHERE e.userid = %s AND wp.status != 'Cancelled'
-            ORDER BY wp.created_at DESC
-        """, (userid,))
+        cursor.execute(WISHLIST_QUERY, (userid,))
 
         columns = [desc[0] for desc in cursor.description]
         wishlist = cursor.fetchall()
 
-        result = []
-        for item in wishlist:
-            item_dict = dict(zip(columns, item))
-            
-            # Format time objects
-            if isinstance(item_dict['start_time'], time):
-                item_dict['start_time'] = item_dict['start_time'].strftime("%H:%M:%S")
-            if isinstance(item_dict['end_time'], time):
-                item_dict['end_time'] = item_dict['end_time'].strftime("%H:%M:%S")
-            
-            # Format venue data
-            if item_dict.get('venue_id'):
-                item_dict['venue'] = {
-                    'venue_id': item_dict['venue_id'],
-                    'venue_name': item_dict['venue_name'],
-                    'location': item_dict['location'],
-                    'venue_price': float(item_dict['venue_price']) if item_dict['venue_price'] else 0,
-                    'description': item_dict['venue_description'],
-                    'venue_capacity': item_dict['venue_capacity'],
-                    'status': item_dict['venue_status'],
-                    'remarks': item_dict['venue_remarks']
-                }
-            else:
-                item_dict['venue'] = None
-            
-            # Format outfit details with enhanced logging
-            logger.info(f"Processing event {item_dict.get('event_name')} (ID: {item_dict.get('events_id')})")
-            logger.info(f"Gown package info - Name: {item_dict.get('gown_package_name')}, Price: {item_dict.get('gown_package_price')}")
-            
-            if item_dict.get('outfit_details'):
-                try:
-                    logger.info(f"Raw outfit_details: {item_dict['outfit_details']}")
-                    if isinstance(item_dict['outfit_details'], list):
-                        outfits = []
-                        for details in item_dict['outfit_details']:
-                            if details is not None:
-                                outfit = {
-                                    'outfit_id': details[0] if len(details) > 0 else None,
-                                    'outfit_name': details[1] if len(details) > 1 else None,
-                                    'outfit_type': details[2] if len(details) > 2 else None,
-                                    'outfit_color': details[3] if len(details) > 3 else None,
-                                    'outfit_desc': details[4] if len(details) > 4 else None,
-                                    'rent_price': details[5] if len(details) > 5 else None,
-                                    'outfit_img': details[6] if len(details) > 6 else None,
-                                    'status': details[7] if len(details) > 7 else None,
-                                    'remarks': details[8] if len(details) > 8 else None
-                                }
-                                logger.info(f"Processed outfit: {outfit}")
-                                outfits.append(outfit)
-                        item_dict['outfits'] = outfits
-                        logger.info(f"Total outfits processed: {len(outfits)}")
-                    else:
-                        logger.warning(f"outfit_details is not a list: {type(item_dict['outfit_details'])}")
-                        item_dict['outfits'] = []
-                except Exception as e:
-                    logger.error(f"Error processing outfit details: {str(e)}")
-                    item_dict['outfits'] = []
-            else:
-                logger.info("No outfit_details found for this event")
-                item_dict['outfits'] = []
-
-            # Format supplier details
-            if item_dict.get('supplier_ids'):
-                item_dict['suppliers'] = [
-                    {
-                        'supplier_id': supplier_id,
-                        'name': name,
-                        'service': service,
-                        'price': price,
-                        'status': status,
-                        'remarks': remarks
-                    }
-                    for supplier_id, name, service, price, status, remarks in zip(
-                        item_dict['supplier_ids'],
-                        item_dict['supplier_names'],
-                        item_dict['services'],
-                        item_dict['supplier_prices'],
-                        item_dict['supplier_statuses'],
-                        item_dict['supplier_remarks']
-                    )
-                ]
-            else:
-                item_dict['suppliers'] = []
-
-            # Format additional services
-            if item_dict.get('service_ids'):
-                item_dict['additional_services'] = [
-                    {
-                        'add_service_id': service_id,
-                        'add_service_name': name,
-                        'add_service_description': description,
-                        'add_service_price': price,
-                        'status': status,
-                        'remarks': remarks
-                    }
-                    for service_id, name, description, price, status, remarks in zip(
-                        item_dict['service_ids'],
-                        item_dict['service_names'],
-                        item_dict['service_descriptions'],
-                        item_dict['service_prices'],
-                        item_dict['service_statuses'],
-                        item_dict['service_remarks']
-                    )
-                ]
-            else:
-                item_dict['additional_services'] = []
-
-            # Clean up temporary fields
-            fields_to_remove = [
-                'outfit_details',
-                'supplier_ids', 'supplier_names', 'services', 'supplier_prices',
-                'supplier_statuses', 'supplier_remarks',
-                'service_ids', 'service_names', 'service_descriptions',
-                'service_prices', 'service_statuses', 'service_remarks',
-                'venue_id', 'venue_name', 'location', 'venue_price', 'venue_description',
-                'venue_capacity', 'venue_status', 'venue_remarks'
-            ]
-            for field in fields_to_remove:
-                item_dict.pop(field, None)
-
-            result.append(item_dict)
-
-        return result
+        return [_format_wishlist_item(dict(zip(columns, item))) for item in wishlist]
 
     except Exception as e:
         logger.error(f"Error in get_user_wishlist: {str(e)}")
@@ -296,6 +302,129 @@ def get_user_wishlist(userid):
         cursor.close()
         conn.close()
 
+
+def iter_user_wishlist(userid):
+    """Like get_user_wishlist, but yields packages as they are fetched through a server-side cursor."""
+    for columns, rows in stream_query(WISHLIST_QUERY, (userid,)):
+        for item in rows:
+            yield _format_wishlist_item(dict(zip(columns, item)))
+
+
+def _format_wishlist_item(item_dict):
+    """Nest the venue, outfits, suppliers and additional services of a wishlist row."""
+    # Format venue data
+    if item_dict.get('venue_id'):
+        item_dict['venue'] = {
+            'venue_id': item_dict['venue_id'],
+            'venue_name': item_dict['venue_name'],
+            'location': item_dict['location'],
+            'venue_price': float(item_dict['venue_price']) if item_dict['venue_price'] else 0,
+            'description': item_dict['venue_description'],
+            'venue_capacity': item_dict['venue_capacity'],
+            'status': item_dict['venue_status'],
+            'remarks': item_dict['venue_remarks']
+        }
+    else:
+        item_dict['venue'] = None
+
+    # Format outfit details with enhanced logging
+    logger.info(f"Processing event {item_dict.get('event_name')} (ID: {item_dict.get('events_id')})")
+    logger.info(f"Gown package info - Name: {item_dict.get('gown_package_name')}, Price: {item_dict.get('gown_package_price')}")
+
+    if item_dict.get('outfit_details'):
+        try:
+            logger.info(f"Raw outfit_details: {item_dict['outfit_details']}")
+            if isinstance(item_dict['outfit_details'], list):
+                outfits = []
+                for details in item_dict['outfit_details']:
+                    if details is not None:
+                        outfit = {
+                            'outfit_id': details[0] if len(details) > 0 else None,
+                            'outfit_name': details[1] if len(details) > 1 else None,
+                            'outfit_type': details[2] if len(details) > 2 else None,
+                            'outfit_color': details[3] if len(details) > 3 else None,
+                            'outfit_desc': details[4] if len(details) > 4 else None,
+                            'rent_price': details[5] if len(details) > 5 else None,
+                            'outfit_img': details[6] if len(details) > 6 else None,
+                            'status': details[7] if len(details) > 7 else None,
+                            'remarks': details[8] if len(details) > 8 else None
+                        }
+                        logger.info(f"Processed outfit: {outfit}")
+                        outfits.append(outfit)
+                item_dict['outfits'] = outfits
+                logger.info(f"Total outfits processed: {len(outfits)}")
+            else:
+                logger.warning(f"outfit_details is not a list: {type(item_dict['outfit_details'])}")
+                item_dict['outfits'] = []
+        except Exception as e:
+            logger.error(f"Error processing outfit details: {str(e)}")
+            item_dict['outfits'] = []
+    else:
+        logger.info("No outfit_details found for this event")
+        item_dict['outfits'] = []
+
+    # Format supplier details
+    if item_dict.get('supplier_ids'):
+        item_dict['suppliers'] = [
+            {
+                'supplier_id': supplier_id,
+                'name': name,
+                'service': service,
+                'price': price,
+                'status': status,
+                'remarks': remarks
+            }
+            for supplier_id, name, service, price, status, remarks in zip(
+                item_dict['supplier_ids'],
+                item_dict['supplier_names'],
+                item_dict['services'],
+                item_dict['supplier_prices'],
+                item_dict['supplier_statuses'],
+                item_dict['supplier_remarks']
+            )
+        ]
+    else:
+        item_dict['suppliers'] = []
+
+    # Format additional services
+    if item_dict.get('service_ids'):
+        item_dict['additional_services'] = [
+            {
+                'add_service_id': service_id,
+                'add_service_name': name,
+                'add_service_description': description,
+                'add_service_price': price,
+                'status': status,
+                'remarks': remarks
+            }
+            for service_id, name, description, price, status, remarks in zip(
+                item_dict['service_ids'],
+                item_dict['service_names'],
+                item_dict['service_descriptions'],
+                item_dict['service_prices'],
+                item_dict['service_statuses'],
+                item_dict['service_remarks']
+            )
+        ]
+    else:
+        item_dict['additional_services'] = []
+
+    # Clean up temporary fields
+    fields_to_remove = [
+        'outfit_details',
+        'supplier_ids', 'supplier_names', 'services', 'supplier_prices',
+        'supplier_statuses', 'supplier_remarks',
+        'service_ids', 'service_names', 'service_descriptions',
+        'service_prices', 'service_statuses', 'service_remarks',
+        'venue_id', 'venue_name', 'location', 'venue_price', 'venue_description',
+        'venue_capacity', 'venue_status', 'venue_remarks'
+    ]
+    for field in fields_to_remove:
+        item_dict.pop(field, None)
+
+    return item_dict
+
+
 def add_event_entry(wishlist_id, schedule, start_time, end_time, status):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -335,6 +464,16 @@ def check_user_exists(userid):
 
 
 def get_user_id_by_email(email):
+    """
+    Get user ID by email, memoized in identity_cache
+    """
+    return identity_cache.get_or_load(
+        ('userid', email),
+        lambda: _load_user_id_by_email(email),
+        tag_of=lambda userid: userid
+    )
+
+def _load_user_id_by_email(email):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -348,6 +487,13 @@ def get_user_id_by_email(email):
         cursor.close()
         conn.close()
 
+def invalidate_user_identity(userid):
+    """
+    Drop every cached email -> id lookup that resolved to this user.
+    Call after changing or deleting a user.
+    """
+    identity_cache.invalidate_tag(userid)
+
         # Outfit Model
 def create_outfit(outfit_name, outfit_type, outfit_color, outfit_desc, rent_price, status, outfit_img):
     conn = get_db_connection()
@@ -405,38 +551,52 @@ def book_outfit(userid, outfit_id, pickup_date, return_date, status, additional_
         cursor.close()
         conn.close()
 
+# Output fields of get_outfits, in the column order of the outfits table
+OUTFIT_FIELDS = (
+    'outfit_id', 'outfit_name', 'outfit_type', 'outfit_color', 'outfit_desc',
+    'rent_price', 'status', 'outfit_img', 'size', 'weight'
+)
+
+
 # Fetch outfits
-def get_outfits():
+def get_outfits(fields=None, columnar=False):
+    """
+    Get all outfits.
+    :param fields: Optional subset of OUTFIT_FIELDS; only those columns are selected
+    :param columnar: Return the columnar_rows layout instead of a list of dicts
+    """
     conn = get_db_connection()  # Assuming you have a function to get the DB connection
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM outfits")
+        names, query = _outfits_query(fields, columnar)
+        cursor.execute(query)
         outfits = cursor.fetchall()
-        if outfits:
-            return [
-                {
-                    'outfit_id': item[0],
-                    'outfit_name': item[1],
-                    'outfit_type': item[2],
-                    'outfit_color': item[3],
-                    'outfit_desc': item[4],
-                    'rent_price': item[5],
-                    'status': item[6],
-                    'outfit_img': item[7],
-                    'size': item[8],
-                    'weight': item[9],
-                }
-                for item in outfits
-            ]
-        else:
-            return []  # No outfits found
+        if columnar:
+            return columnar_rows(cursor, outfits)
+        return [dict(zip(names, item)) for item in outfits]
     except Exception as e:
+        # Raised, not answered with [], so the route fails instead of caching an empty catalog
         logger.error(f"Error fetching outfits: {e}")
-        return []
+        raise
     finally:
         cursor.close()
         conn.close()
 
+
+def iter_outfits(fields=None):
+    """Like get_outfits, but yields outfits as they are fetched through a server-side cursor."""
+    names, query = _outfits_query(fields)
+    for _, rows in stream_query(query):
+        for item in rows:
+            yield dict(zip(names, item))
+
+
+def _outfits_query(fields, columnar=False):
+    names = [field for field in OUTFIT_FIELDS if fields is None or field in fields]
+    # The columnar layout is named from the result columns, so they are always listed
+    select_all = fields is None and not columnar
+    return names, f"SELECT {'*' if select_all else ', '.join(names)} FROM outfits"
+
 # Fetch a specific outfit by ID
 def get_outfit_by_id(outfit_id):
     conn = get_db_connection()
@@ -526,18 +686,7 @@ def get_booked_outfits():
         booked_outfits = cursor.fetchall()
         
         if booked_outfits:
-            return [
-                {
-                    'outfit_booked_id': item[0],
-                    'userid': item[1],
-                    'outfit_id': item[2],
-                    'pickup_date': item[3],
-                    'return_date': item[4],
-                    'status': item[5],
-                    'additional_charges': item[6]
-                }
-                for item in booked_outfits
-            ]
+            return [_booked_outfit_dict(item) for item in booked_outfits]
         else:
             return []  # No booked outfits found
     except Exception as e:
@@ -552,36 +701,93 @@ def get_booked_outfits_by_user(userid):
     return [outfit for outfit in booked_outfits if outfit['userid'] == userid]
 
 
+def iter_booked_outfits_by_user(userid):
+    """Like get_booked_outfits_by_user, but filtered in SQL and yielded through a server-side cursor."""
+    for _, rows in stream_query("SELECT * FROM booked_outfit WHERE userid = %s", (userid,)):
+        for item in rows:
+            yield _booked_outfit_dict(item)
+
+
+def _booked_outfit_dict(item):
+    return {
+        'outfit_booked_id': item[0],
+        'userid': item[1],
+        'outfit_id': item[2],
+        'pickup_date': item[3],
+        'return_date': item[4],
+        'status': item[5],
+        'additional_charges': item[6]
+    }
+
+
 
 #package models
 
-def get_client_packages():
+# Output fields of get_client_packages -> SQL expression over event_packages "p" and its joins.
+# "suppliers" and "additional_services" are aggregated per package in correlated subqueries.
+CLIENT_PACKAGE_FIELDS = {
+    'package_id': 'p.package_id',
+    'package_name': 'p.package_name',
+    'event_type_name': "COALESCE(et.event_type_name, 'Unknown')",
+    'event_type_id': 'p.event_type_id',
+    'capacity': 'COALESCE(p.capacity, 0)',
+    'description': "COALESCE(p.description, '')",
+    'venue_id': 'p.venue_id',
+    'venue_name': "COALESCE(v.venue_name, 'No Venue')",
+    'gown_package_id': 'p.gown_package_id',
+    'gown_package_name': "COALESCE(gp.gown_package_name, 'No Gown Package')",
+    'additional_capacity_charges': 'COALESCE(p.additional_capacity_charges, 0)',
+    'charge_unit': 'COALESCE(p.charge_unit, 1)',
+    'total_price': 'COALESCE(p.total_price, 0)',
+    'created_at': 'p.created_at',
+    'status': "COALESCE(p.status, 'Active')",
+    'suppliers': """
+        COALESCE((
+            SELECT json_agg(json_build_object(
+                'supplier_id', s.supplier_id,
+                'name', TRIM(COALESCE(u.firstname, '') || ' ' || COALESCE(u.lastname, '')),
+                'service', COALESCE(s.service, 'Unknown'),
+                'price', COALESCE(s.price, 0)::float8,
+                'remarks', COALESCE(ps.remarks, '')
+            ) ORDER BY eps.package_service_id)
+            FROM event_package_services eps
+            JOIN package_service ps ON eps.package_service_id = ps.package_service_id
+            JOIN suppliers s ON ps.supplier_id = s.supplier_id
+            LEFT JOIN users u ON s.userid = u.userid
+            WHERE eps.package_id = p.package_id
+        ), '[]'::json)
+    """,
+    'additional_services': """
+        COALESCE((
+            SELECT json_agg(json_build_object(
+                'service_id', a.add_service_id,
+                'name', COALESCE(a.add_service_name, 'Unknown Service'),
+                'price', COALESCE(a.add_service_price, 0)::float8
+            ) ORDER BY a.add_service_id)
+            FROM event_package_additional_services epas
+            JOIN additional_services a ON epas.add_service_id = a.add_service_id
+            WHERE epas.package_id = p.package_id
+        ), '[]'::json)
+    """
+}
+
+
+def get_client_packages(fields=None):
     """
     Get packages formatted for the client-side application.
     Only returns active packages regardless of venue and gown package status.
+    Suppliers and additional services come from the same query, aggregated per package.
+    :param fields: Optional subset of CLIENT_PACKAGE_FIELDS; only what they need is selected
     """
+    columns = [field for field in CLIENT_PACKAGE_FIELDS if fields is None or field in fields]
+
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Get basic package information with event type
-        cursor.execute("""
-            SELECT 
-                p.package_id,
-                p.package_name,
-                COALESCE(et.event_type_name, 'Unknown') as event_type_name,
-                p.event_type_id,
-                COALESCE(p.capacity, 0) as capacity,
-                COALESCE(p.description, '') as description,
-                p.venue_id,
-                COALESCE(v.venue_name, 'No Venue') as venue_name,
-                p.gown_package_id,
-                COALESCE(gp.gown_package_name, 'No Gown Package') as gown_package_name,
-                COALESCE(p.additional_capacity_charges, 0) as additional_capacity_charges,
-                COALESCE(p.charge_unit, 1) as charge_unit,
-                COALESCE(p.total_price, 0) as total_price,
-                p.created_at,
-                COALESCE(p.status, 'Active') as status
+        # Get basic package information with event type; unused joins are removed by the planner
+        cursor.execute(f"""
+            SELECT {', '.join(f"{CLIENT_PACKAGE_FIELDS[column]} AS {column}" for column in columns)}
             FROM event_packages p
             LEFT JOIN venues v ON p.venue_id = v.venue_id
             LEFT JOIN gown_package gp ON p.gown_package_id = gp.gown_package_id
@@ -598,81 +804,12 @@ def get_client_packages():
         # Convert rows to dictionaries
         packages = []
         for row in rows:
-            package = {
-                'package_id': row[0],
-                'package_name': row[1],
-                'event_type_name': row[2],
-                'event_type_id': row[3],
-                'capacity': row[4],
-                'description': row[5],
-                'venue_id': row[6],
-                'venue_name': row[7],
-                'gown_package_id': row[8],
-                'gown_package_name': row[9],
-                'additional_capacity_charges': float(row[10]) if row[10] else 0,
-                'charge_unit': row[11],
-                'total_price': float(row[12]) if row[12] else 0,
-                'created_at': row[13].strftime('%Y-%m-%d') if row[13] else None,
-                'status': row[14],
-                'suppliers': [],
-                'additional_services': []
-            }
-            
-            # Get suppliers for this package (include all suppliers regardless of status)
-            cursor.execute("""
-                SELECT 
-                    s.supplier_id,
-                    COALESCE(u.firstname, '') as firstname,
-                    COALESCE(u.lastname, '') as lastname,
-                    COALESCE(s.service, 'Unknown') as service,
-                    COALESCE(s.price, 0) as price,
-                    COALESCE(ps.remarks, '') as remarks
-                FROM event_package_services eps
-                LEFT JOIN package_service ps ON eps.package_service_id = ps.package_service_id
-                LEFT JOIN suppliers s ON ps.supplier_id = s.supplier_id
-                LEFT JOIN users u ON s.userid = u.userid
-                WHERE eps.package_id = %s
-            """, (row[0],))
-            
-            supplier_rows = cursor.fetchall()
-            for supplier_row in supplier_rows:
-                try:
-                    if supplier_row[0] is not None:  # Only add if supplier_id is not NULL
-                        package['suppliers'].append({
-                            'supplier_id': supplier_row[0],
-                            'name': f"{supplier_row[1]} {supplier_row[2]}".strip(),
-                            'service': supplier_row[3],
-                            'price': float(supplier_row[4]) if supplier_row[4] else 0,
-                            'remarks': supplier_row[5]
-                        })
-                except Exception as e:
-                    print(f"Error processing supplier row: {e}")
-                    continue
-                
-            # Get additional services for this package (include all services regardless of status)
-            cursor.execute("""
-                SELECT 
-                    a.add_service_id,
-                    COALESCE(a.add_service_name, 'Unknown Service') as add_service_name,
-                    COALESCE(a.add_service_price, 0) as add_service_price
-                FROM event_package_additional_services epas
-                LEFT JOIN additional_services a ON epas.add_service_id = a.add_service_id
-                WHERE epas.package_id = %s
-            """, (row[0],))
-            
-            service_rows = cursor.fetchall()
-            for service_row in service_rows:
-                try:
-                    if service_row[0] is not None:  # Only add if service_id is not NULL
-                        package['additional_services'].append({
-                            'service_id': service_row[0],
-                            'name': service_row[1],
-                            'price': float(service_row[2]) if service_row[2] else 0
-                        })
-                except Exception as e:
-                    print(f"Error processing service row: {e}")
-                    continue
-            
+            package = dict(zip(columns, row))
+            for column in ('additional_capacity_charges', 'total_price'):
+                if column in package:
+                    package[column] = float(package[column]) if package[column] else 0
+            if 'created_at' in package:
+                package['created_at'] = package['created_at'].strftime('%Y-%m-%d') if package['created_at'] else None
             packages.append(package)
         
         return packages
@@ -755,6 +892,267 @@ def get_package_details_by_id(package_id):
 
 
 
+# Resource-level predicates shared by the date-based availability queries.
+# Each one expects the alias named in its comment and takes the date as its only parameter.
+
+# Venue alias "v": the venue is held by a non-cancelled event on the date
+VENUE_BOOKED_ON_DATE_SQL = """
+    EXISTS (
+        SELECT 1
+        FROM events e
+        JOIN wishlist_packages wp ON e.events_id = wp.events_id
+        LEFT JOIN wishlist_venues wv ON wp.wishlist_id = wv.wishlist_id
+        WHERE (wp.venue_id = v.venue_id OR wv.venue_id = v.venue_id)
+        AND e.schedule = %s
+        AND UPPER(COALESCE(e.status, '')) <> 'CANCELLED'
+        AND UPPER(COALESCE(wp.status, '')) <> 'CANCELLED'
+    )
+"""
+
+# Outfit alias "o": the outfit is out on a rental covering the date
+OUTFIT_BOOKED_ON_DATE_SQL = """
+    EXISTS (
+        SELECT 1 FROM booked_outfit bo
+        WHERE bo.outfit_id = o.outfit_id
+        AND %s BETWEEN bo.pickup_date AND bo.return_date
+        AND UPPER(COALESCE(bo.status, '')) <> 'CANCELLED'
+    )
+"""
+
+# Supplier alias "s": the supplier blocked the date in supplier_availability
+SUPPLIER_BLOCKED_ON_DATE_SQL = """
+    EXISTS (
+        SELECT 1 FROM supplier_availability sa
+        WHERE sa.date = %s AND sa.supplier_id = s.supplier_id AND NOT sa.is_available
+    )
+"""
+
+# Supplier alias "s": the supplier is approved for a non-cancelled event on the date
+SUPPLIER_BOOKED_ON_DATE_SQL = """
+    EXISTS (
+        SELECT 1
+        FROM wishlist_suppliers ws
+        JOIN wishlist_packages wp ON ws.wishlist_id = wp.wishlist_id
+        JOIN events e ON wp.events_id = e.events_id
+        WHERE ws.supplier_id = s.supplier_id
+        AND UPPER(ws.status) = 'APPROVED'
+        AND e.schedule = %s
+        AND UPPER(COALESCE(e.status, '')) <> 'CANCELLED'
+    )
+"""
+
+def get_package_availability(package_id, event_date):
+    """
+    Check every component of a package (venue, gown package outfits and suppliers)
+    against existing bookings and supplier availability for a date, in one query.
+    :return: Dict with an overall 'available' flag and per-component conflicts,
+             or None if the package does not exist
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(f"""
+            WITH pkg AS (
+                SELECT package_id, venue_id, gown_package_id
+                FROM event_packages
+                WHERE package_id = %s
+            ),
+            components AS (
+                SELECT 'venue' AS component_type, v.venue_id AS component_id, v.venue_name AS name
+                FROM pkg
+                JOIN venues v ON pkg.venue_id = v.venue_id
+                UNION
+                SELECT 'outfit', o.outfit_id, o.outfit_name
+                FROM pkg
+                JOIN gown_package_outfits gpo ON pkg.gown_package_id = gpo.gown_package_id
+                JOIN outfits o ON gpo.outfit_id = o.outfit_id
+                UNION
+                SELECT 'supplier', s.supplier_id, u.firstname || ' ' || u.lastname
+                FROM pkg
+                JOIN event_package_services eps ON pkg.package_id = eps.package_id
+                JOIN package_service ps ON eps.package_service_id = ps.package_service_id
+                JOIN suppliers s ON ps.supplier_id = s.supplier_id
+                JOIN users u ON s.userid = u.userid
+            )
+            SELECT
+                c.component_type,
+                c.component_id,
+                c.name,
+                ARRAY_REMOVE(ARRAY[
+                    CASE WHEN v.venue_id IS NOT NULL AND {VENUE_BOOKED_ON_DATE_SQL} THEN 'venue_booked' END,
+                    CASE WHEN o.outfit_id IS NOT NULL AND {OUTFIT_BOOKED_ON_DATE_SQL} THEN 'outfit_booked' END,
+                    CASE WHEN s.supplier_id IS NOT NULL AND {SUPPLIER_BLOCKED_ON_DATE_SQL} THEN 'supplier_unavailable' END,
+                    CASE WHEN s.supplier_id IS NOT NULL AND {SUPPLIER_BOOKED_ON_DATE_SQL} THEN 'supplier_booked' END
+                ], NULL) AS conflicts
+            FROM pkg
+            LEFT JOIN components c ON TRUE
+            LEFT JOIN venues v ON c.component_type = 'venue' AND v.venue_id = c.component_id
+            LEFT JOIN outfits o ON c.component_type = 'outfit' AND o.outfit_id = c.component_id
+            LEFT JOIN suppliers s ON c.component_type = 'supplier' AND s.supplier_id = c.component_id
+            ORDER BY c.component_type DESC, c.component_id
+        """, (package_id, event_date, event_date, event_date, event_date))
+
+        rows = cursor.fetchall()
+        if not rows:
+            return None
+
+        components = [
+            {
+                'component_type': row[0],
+                'component_id': row[1],
+                'name': row[2],
+                'available': not row[3],
+                'conflicts': row[3] or []
+            }
+            for row in rows
+            if row[0] is not None
+        ]
+
+        return {
+            'package_id': package_id,
+            'date': event_date,
+            'available': all(component['available'] for component in components),
+            'components': components
+        }
+    except Exception as e:
+        logger.error(f"Error checking package availability: {e}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+
+def get_next_free_dates(venue_id=None, package_id=None, from_date=None, start_time=None,
+                        end_time=None, limit=5, horizon_days=365):
+    """
+    Find the next dates on which every resource of a venue or package is free.
+    The busy days of all required resources over the horizon are collected as one
+    set and anti-joined against a generate_series of candidate days, so the whole
+    search is a single query regardless of the horizon length.
+    :param from_date: First candidate date (defaults to today)
+    :param start_time: Optional start of the desired time window; venue and supplier
+                       bookings only conflict when their times overlap it
+    :param end_time: Optional end of the desired time window
+    :return: List of free dates as YYYY-MM-DD strings, or None if the venue/package does not exist
+    """
+    from_date = from_date or date.today()
+    to_date = from_date + timedelta(days=horizon_days - 1)
+
+    # Time-window overlap for event-based bookings; events without times block the whole day
+    overlap_sql = """
+        (%s::time IS NULL OR e.start_time IS NULL OR e.end_time IS NULL
+         OR (e.start_time < %s::time AND e.end_time > %s::time))
+    """
+    overlap_params = [start_time, end_time, start_time]
+
+    query = f"""
+        WITH target AS (
+            SELECT %s::int AS venue_id, %s::int AS package_id
+        ),
+        found AS (
+            SELECT EXISTS (SELECT 1 FROM venues v JOIN target t ON v.venue_id = t.venue_id)
+                OR EXISTS (SELECT 1 FROM event_packages ep JOIN target t ON ep.package_id = t.package_id)
+                AS found
+        ),
+        res_venues AS (
+            SELECT venue_id FROM target WHERE venue_id IS NOT NULL
+            UNION
+            SELECT ep.venue_id
+            FROM event_packages ep
+            JOIN target t ON ep.package_id = t.package_id
+            WHERE ep.venue_id IS NOT NULL
+        ),
+        res_outfits AS (
+            SELECT DISTINCT gpo.outfit_id
+            FROM event_packages ep
+            JOIN target t ON ep.package_id = t.package_id
+            JOIN gown_package_outfits gpo ON ep.gown_package_id = gpo.gown_package_id
+        ),
+        res_suppliers AS (
+            SELECT DISTINCT ps.supplier_id
+            FROM event_packages ep
+            JOIN target t ON ep.package_id = t.package_id
+            JOIN event_package_services eps ON ep.package_id = eps.package_id
+            JOIN package_service ps ON eps.package_service_id = ps.package_service_id
+            WHERE ps.supplier_id IS NOT NULL
+        ),
+        busy AS (
+            SELECT e.schedule AS day
+            FROM events e
+            JOIN wishlist_packages wp ON e.events_id = wp.events_id
+            LEFT JOIN wishlist_venues wv ON wp.wishlist_id = wv.wishlist_id
+            WHERE (wp.venue_id IN (SELECT venue_id FROM res_venues)
+                   OR wv.venue_id IN (SELECT venue_id FROM res_venues))
+            AND e.schedule BETWEEN %s AND %s
+            AND UPPER(COALESCE(e.status, '')) <> 'CANCELLED'
+            AND UPPER(COALESCE(wp.status, '')) <> 'CANCELLED'
+            AND {overlap_sql}
+            UNION
+            SELECT generate_series(GREATEST(bo.pickup_date, %s::date),
+                                   LEAST(bo.return_date, %s::date),
+                                   interval '1 day')::date
+            FROM booked_outfit bo
+            WHERE bo.outfit_id IN (SELECT outfit_id FROM res_outfits)
+            AND bo.pickup_date <= %s AND bo.return_date >= %s
+            AND UPPER(COALESCE(bo.status, '')) <> 'CANCELLED'
+            UNION
+            SELECT sa.date
+            FROM supplier_availability sa
+            WHERE sa.supplier_id IN (SELECT supplier_id FROM res_suppliers)
+            AND sa.date BETWEEN %s AND %s
+            AND NOT sa.is_available
+            UNION
+            SELECT e.schedule
+            FROM wishlist_suppliers ws
+            JOIN wishlist_packages wp ON ws.wishlist_id = wp.wishlist_id
+            JOIN events e ON wp.events_id = e.events_id
+            WHERE ws.supplier_id IN (SELECT supplier_id FROM res_suppliers)
+            AND UPPER(ws.status) = 'APPROVED'
+            AND e.schedule BETWEEN %s AND %s
+            AND UPPER(COALESCE(e.status, '')) <> 'CANCELLED'
+            AND {overlap_sql}
+        )
+        SELECT found.found, free.day
+        FROM found
+        LEFT JOIN LATERAL (
+            SELECT candidate::date AS day
+            FROM generate_series(%s::date, %s::date, interval '1 day') AS candidate
+            WHERE NOT EXISTS (SELECT 1 FROM busy WHERE busy.day = candidate::date)
+            ORDER BY candidate
+            LIMIT %s
+        ) AS free ON found.found
+        ORDER BY free.day
+    """
+    params = (
+        [venue_id, package_id]
+        + [from_date, to_date] + overlap_params
+        + [from_date, to_date, to_date, from_date]
+        + [from_date, to_date]
+        + [from_date, to_date] + overlap_params
+        + [from_date, to_date, limit]
+    )
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+
+        if not rows or not rows[0][0]:
+            return None
+        return [row[1] for row in rows if row[1] is not None]
+    except Exception as e:
+        logger.error(f"Error finding next free dates: {e}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+
 def add_event_item(userid, event_name, event_type, event_theme, event_color, 
                   package_id, suppliers, schedule=None, start_time=None, 
                   end_time=None, status='Wishlist', total_price=0, outfits=None, 
@@ -898,99 +1296,134 @@ def add_event_item(userid, event_name, event_type, event_theme, event_color,
         cursor.close()
         conn.close()
 
-def get_user_id_by_email(email):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+# Output fields of get_available_suppliers -> SQL expression over suppliers "s" and users "u".
+# "name" is derived from firstname and lastname; "social_media" is aggregated per supplier.
+SUPPLIER_FIELDS = {
+    'supplier_id': 's.supplier_id',
+    'firstname': 'u.firstname',
+    'lastname': 'u.lastname',
+    'service': 's.service',
+    'price': 's.price',
+    'email': 'u.email',
+    'contactnumber': 'u.contactnumber',
+    'address': 'u.address',
+    'user_img': 'u.user_img',
+    'name': None,
+    'social_media': """
+        COALESCE((
+            SELECT json_agg(json_build_object('platform', sm.platform, 'handle', sm.handle, 'url', sm.url))
+            FROM supplier_social_media sm
+            WHERE sm.supplier_id = s.supplier_id
+        ), '[]'::json)
+    """
+}
 
-    try:
-        cursor.execute("SELECT userid FROM users WHERE email = %s", (email,))
-        result = cursor.fetchone()
-        return result[0] if result else None
-    finally:
-        cursor.close()
-        conn.close()
 
-def get_available_suppliers():
-    """Get a list of all available suppliers"""
+def get_available_suppliers(date=None, service=None, fields=None, columnar=False):
+    """
+    Get a list of all available suppliers.
+    :param date: Optional event date; excludes suppliers blocked or already booked on it
+    :param service: Optional service name to filter by (case-insensitive)
+    :param fields: Optional subset of SUPPLIER_FIELDS; only what they need is selected
+    :param columnar: Return the columnar_rows layout instead of a list of dicts
+    """
+    names = [field for field in SUPPLIER_FIELDS if fields is None or field in fields]
+    columns = [name for name in names if SUPPLIER_FIELDS[name] is not None]
+    if 'name' in names:
+        columns += [column for column in ('firstname', 'lastname') if column not in columns]
+
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-            SELECT s.supplier_id, u.firstname, u.lastname, s.service, s.price, 
-                   u.email, u.contactnumber, u.address, u.user_img
+        query = f"""
+            SELECT {', '.join(f"{SUPPLIER_FIELDS[column]} AS {column}" for column in columns)}
             FROM suppliers s
             JOIN users u ON s.userid = u.userid
             WHERE s.status = 'Active'
-            ORDER BY s.service, u.lastname
-        """)
+        """
+        params = []
+
+        if service:
+            query += " AND LOWER(s.service) = LOWER(%s)"
+            params.append(service)
+        if date:
+            query += f" AND NOT {SUPPLIER_BLOCKED_ON_DATE_SQL} AND NOT {SUPPLIER_BOOKED_ON_DATE_SQL}"
+            params.extend([date, date])
+
+        query += " ORDER BY s.service, u.lastname"
+
+        cursor.execute(query, params)
         suppliers = cursor.fetchall()
+
+        if columnar:
+            table = columnar_rows(cursor, suppliers)
+            data = table['data']
+            if 'price' in data:
+                data['price'] = [float(price) if price else 0 for price in data['price']]
+            if 'user_img' in data:
+                data['user_img'] = [img if img else None for img in data['user_img']]
+            if 'name' in names:
+                data['name'] = [f"{first} {last}" for first, last in zip(data['firstname'], data['lastname'])]
+            table['columns'] = names
+            table['data'] = {name: data[name] for name in names}
+            return table
         
         suppliers_list = []
         for supplier in suppliers:
-            supplier_data = {
-                'supplier_id': supplier[0],
-                'firstname': supplier[1],
-                'lastname': supplier[2],
-                'service': supplier[3],
-                'price': float(supplier[4]) if supplier[4] else 0,
-                'email': supplier[5],
-                'contactnumber': supplier[6],
-                'address': supplier[7],
-                'user_img': supplier[8] if supplier[8] else None,
-                'name': f"{supplier[1]} {supplier[2]}"
-            }
-            
-            # Get social media for this supplier
-            try:
-                cursor.execute("""
-                    SELECT platform, handle, url 
-                    FROM supplier_social_media 
-                    WHERE supplier_id = %s
-                """, (supplier[0],))
-                social_media = cursor.fetchall()
-                
-                supplier_data['social_media'] = [
-                    {
-                        'platform': sm[0],
-                        'handle': sm[1],
-                        'url': sm[2]
-                    } for sm in social_media
-                ]
-            except Exception as e:
-                print(f"Error fetching social media for supplier {supplier[0]}: {str(e)}")
-                supplier_data['social_media'] = []
-                
-            suppliers_list.append(supplier_data)
+            row = dict(zip(columns, supplier))
+            if 'price' in row:
+                row['price'] = float(row['price']) if row['price'] else 0
+            if 'user_img' in row:
+                row['user_img'] = row['user_img'] if row['user_img'] else None
+            if 'name' in names:
+                row['name'] = f"{row['firstname']} {row['lastname']}"
+            suppliers_list.append({name: row[name] for name in names})
             
         return suppliers_list
     finally:
         cursor.close()
         conn.close()
 
-def get_available_venues():
-    """Get a list of all available venues"""
+# Output fields of get_available_venues, each a venues column
+VENUE_FIELDS = ('venue_id', 'venue_name', 'location', 'venue_price', 'description', 'venue_capacity')
+
+
+def get_available_venues(fields=None, columnar=False):
+    """
+    Get a list of all available venues
+    :param fields: Optional subset of VENUE_FIELDS; only those columns are selected
+    :param columnar: Return the columnar_rows layout instead of a list of dicts
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-            SELECT venue_id, venue_name, location, venue_price, description, venue_capacity 
+        names = [field for field in VENUE_FIELDS if fields is None or field in fields]
+        cursor.execute(f"""
+            SELECT {', '.join(names)}
             FROM venues 
             WHERE status = 'Active' 
             ORDER BY venue_name
         """)
         venues = cursor.fetchall()
+
+        if columnar:
+            table = columnar_rows(cursor, venues)
+            data = table['data']
+            if 'venue_price' in data:
+                data['venue_price'] = [float(price) if price else 0 for price in data['venue_price']]
+            if 'venue_capacity' in data:
+                data['venue_capacity'] = [capacity if capacity else 0 for capacity in data['venue_capacity']]
+            return table
         
-        return [
-            {
-                'venue_id': venue[0],
-                'venue_name': venue[1],
-                'location': venue[2],
-                'venue_price': float(venue[3]) if venue[3] else 0,
-                'description': venue[4],
-                'venue_capacity': venue[5] if venue[5] else 0
-            }
-            for venue in venues
-        ]
+        result = []
+        for row in venues:
+            venue = dict(zip(names, row))
+            if 'venue_price' in venue:
+                venue['venue_price'] = float(venue['venue_price']) if venue['venue_price'] else 0
+            if 'venue_capacity' in venue:
+                venue['venue_capacity'] = venue['venue_capacity'] if venue['venue_capacity'] else 0
+            result.append(venue)
+        return result
     finally:
         cursor.close()
         conn.close()
@@ -1123,9 +1556,10 @@ def initialize_event_types():
         cursor.close()
         conn.close()
 
-def get_booked_schedules():
+def get_booked_schedules(columnar=False):
     """
     Get all booked event schedules that are not cancelled
+    :param columnar: Return the columnar_rows layout instead of a list of dicts
     """
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -1144,11 +1578,18 @@ def get_booked_schedules():
         
         cursor.execute(query)
         schedules = cursor.fetchall()
+
+        if columnar:
+            table = columnar_rows(cursor, schedules)
+            data = table['data']
+            for column in ('start_time', 'end_time'):
+                data[column] = [value.strftime('%H:%M') if value else None for value in data[column]]
+            return table
         
         if schedules:
             return [
                 {
-                    'schedule': schedule.strftime('%Y-%m-%d') if schedule else None,
+                    'schedule': schedule,
                     'start_time': start_time.strftime('%H:%M') if start_time else None,
                     'end_time': end_time.strftime('%H:%M') if end_time else None
                 }
@@ -1158,6 +1599,9 @@ def get_booked_schedules():
         
     except Exception as e:
         logger.error(f"Error fetching booked schedules: {e}")
+        if columnar:
+            # An empty list is not a columnar table; let the route report the error
+            raise
         return []
     finally:
         cursor.close()
@@ -1557,6 +2001,7 @@ def update_user_profile(userid, firstname, lastname, username, contactnumber, ad
             (firstname, lastname, username, contactnumber, address, userid)
         )
         conn.commit()
+        invalidate_user_identity(userid)
         return cursor.rowcount > 0
     except Exception as e:
         logger.error(f"Error updating user profile: {e}")
@@ -1568,7 +2013,7 @@ def update_user_profile(userid, firstname, lastname, username, contactnumber, ad
 
 def update_user_profile_picture(userid, image_path):
     """
-    Update user profile picture.
+    Update user profile picture and delete the previous one once nothing references it.
     :param userid: User ID
     :param image_path: Path to the uploaded image
     :return: True if successful, False otherwise
@@ -1580,21 +2025,33 @@ def update_user_profile_picture(userid, image_path):
         # Log the update attempt
         logger.info(f"Updating profile picture for user {userid} with path {image_path}")
         
+        # Swap the image and count the remaining references to the old one in one statement;
+        # the old/ref CTEs read the snapshot from before the update
         cursor.execute(
-            """UPDATE users 
-               SET user_img = %s
-               WHERE userid = %s
-               RETURNING user_img""",
-            (image_path, userid)
+            """WITH old AS (
+                   SELECT user_img FROM users WHERE userid = %s
+               ),
+               updated AS (
+                   UPDATE users 
+                   SET user_img = %s
+                   WHERE userid = %s
+                   RETURNING user_img
+               )
+               SELECT (SELECT user_img FROM updated),
+                      (SELECT user_img FROM old),
+                      (SELECT COUNT(*) FROM users WHERE user_img = (SELECT user_img FROM old) AND userid <> %s)""",
+            (userid, image_path, userid, userid)
         )
         
         # Get the updated value to confirm it worked
-        updated_path = cursor.fetchone()
+        updated_path, previous_path, previous_references = cursor.fetchone()
         
         conn.commit()
         
         if updated_path:
             logger.info(f"Successfully updated profile picture for user {userid}")
+            if previous_path and previous_path != image_path and previous_references == 0:
+                remove_profile_image(previous_path)
             return True
         
         logger.warning(f"Failed to update profile picture: no rows updated for user {userid}")
@@ -1608,6 +2065,20 @@ def update_user_profile_picture(userid, image_path):
         cursor.close()
         conn.close()
 
+def count_profile_image_references(image_path):
+    """
+    Count users whose profile picture is image_path
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT COUNT(*) FROM users WHERE user_img = %s", (image_path,))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.close()
+
 def get_user_profile_by_id(userid):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -1673,8 +2144,6 @@ def change_password(user_id, current_password, new_password):
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    current_password_hash = hash_password(current_password)
-    new_password_hash = hash_password(new_password)
 
     try:
         # First verify the current password
@@ -1687,17 +2156,19 @@ def change_password(user_id, current_password, new_password):
         if not user:
             return False, "User not found"
             
-        if user[0] != current_password_hash:
+        if not verify_password(current_password, user[0])[0]:
             return False, "Current password is incorrect"
             
         # Update the password
         cursor.execute(
             "UPDATE users SET password = %s WHERE userid = %s",
-            (new_password_hash, user_id)
+            (hash_password(new_password), user_id)
         )
         conn.commit()
         return True, "Password changed successfully"
         
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         print(f"Error in change_password: {str(e)}")
         return False, "An error occurred while changing password"
@@ -1705,11 +2176,94 @@ def change_password(user_id, current_password, new_password):
         cursor.close()
         conn.close()
 
+# Approved bookings of one supplier (the only parameter), upcoming first
+SUPPLIER_EVENTS_QUERY = """
+    WITH outfit_info AS (
+        SELECT 
+            wo.wishlist_id,
+            array_agg(
+                json_build_object(
+                    'wishlist_outfit_id', wo.wishlist_outfit_id,
+                    'outfit_id', o.outfit_id,
+                    'outfit_name', o.outfit_name,
+                    'outfit_type', o.outfit_type,
+                    'outfit_color', o.outfit_color,
+                    'outfit_desc', o.outfit_desc,
+                    'outfit_img', o.outfit_img,
+                    'gown_package_id', wo.gown_package_id,
+                    'gown_package_name', gp.gown_package_name,
+                    'gown_package_price', gp.gown_package_price,
+                    'price', wo.price,
+                    'status', wo.status,
+                    'remarks', wo.remarks,
+                    'created_at', wo.created_at,
+                    'has_been_updated', wo.has_been_updated
+                )
+            ) as outfit_details
+        FROM wishlist_outfits wo
+        LEFT JOIN outfits o ON wo.outfit_id = o.outfit_id
+        LEFT JOIN gown_package gp ON wo.gown_package_id = gp.gown_package_id
+        GROUP BY wo.wishlist_id
+    )
+    SELECT 
+        e.events_id,
+        e.event_name,
+        e.event_type,
+        e.event_theme,
+        e.event_color,
+        e.schedule,
+        e.start_time,
+        e.end_time,
+        e.status as event_status,
+        e.total_price as event_total_price,
+        e.booking_type,
+        client.firstname as client_firstname,
+        client.lastname as client_lastname,
+        client.contactnumber as client_contact,
+        client.address as client_address,
+        ws.status as booking_status,
+        ws.price as supplier_price,
+        ws.remarks as booking_remarks,
+        supp.service as supplier_service,
+        u.username as supplier_username,
+        wp.package_name,
+        wp.venue_status,
+        v.venue_id,
+        v.venue_name,
+        v.location as venue_location,
+        v.venue_price,
+        v.description as venue_description,
+        v.venue_capacity,
+        v.image as venue_image,
+        wv.price as booked_venue_price,
+        oi.outfit_details
+    FROM events e
+    JOIN users client ON e.userid = client.userid
+    JOIN wishlist_packages wp ON e.events_id = wp.events_id
+    JOIN wishlist_suppliers ws ON wp.wishlist_id = ws.wishlist_id
+    JOIN suppliers supp ON ws.supplier_id = supp.supplier_id
+    JOIN users u ON supp.userid = u.userid
+    LEFT JOIN wishlist_venues wv ON wp.wishlist_id = wv.wishlist_id
+    LEFT JOIN venues v ON wp.venue_id = v.venue_id OR wv.venue_id = v.venue_id
+    LEFT JOIN outfit_info oi ON wp.wishlist_id = oi.wishlist_id
+    WHERE supp.supplier_id = %s
+    AND UPPER(ws.status) = 'APPROVED'
+    ORDER BY 
+        CASE 
+            WHEN e.schedule > CURRENT_DATE THEN 1
+            WHEN e.schedule = CURRENT_DATE THEN 2
+            ELSE 3
+        END,
+        e.schedule ASC,
+        e.start_time ASC
+"""
+
+
 def get_supplier_booked_events(user_email):
     try:
         print(f"DEBUG: Getting events for supplier email: {user_email}")
         conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
         
         # First check if the user exists and is a supplier
         cursor.execute("""
@@ -1726,121 +2280,15 @@ def get_supplier_booked_events(user_email):
             return []
             
         # Query to get events where the supplier is booked
-        query = """
-            WITH outfit_info AS (
-                SELECT 
-                    wo.wishlist_id,
-                    array_agg(
-                        json_build_object(
-                            'wishlist_outfit_id', wo.wishlist_outfit_id,
-                            'outfit_id', o.outfit_id,
-                            'outfit_name', o.outfit_name,
-                            'outfit_type', o.outfit_type,
-                            'outfit_color', o.outfit_color,
-                            'outfit_desc', o.outfit_desc,
-                            'outfit_img', o.outfit_img,
-                            'gown_package_id', wo.gown_package_id,
-                            'gown_package_name', gp.gown_package_name,
-                            'gown_package_price', gp.gown_package_price,
-                            'price', wo.price,
-                            'status', wo.status,
-                            'remarks', wo.remarks,
-                            'created_at', wo.created_at,
-                            'has_been_updated', wo.has_been_updated
-                        )
-                    ) as outfit_details
-                FROM wishlist_outfits wo
-                LEFT JOIN outfits o ON wo.outfit_id = o.outfit_id
-                LEFT JOIN gown_package gp ON wo.gown_package_id = gp.gown_package_id
-                GROUP BY wo.wishlist_id
-            )
-            SELECT 
-                e.events_id,
-                e.event_name,
-                e.event_type,
-                e.event_theme,
-                e.event_color,
-                e.schedule,
-                e.start_time,
-                e.end_time,
-                e.status as event_status,
-                e.total_price as event_total_price,
-                e.booking_type,
-                client.firstname as client_firstname,
-                client.lastname as client_lastname,
-                client.contactnumber as client_contact,
-                client.address as client_address,
-                ws.status as booking_status,
-                ws.price as supplier_price,
-                ws.remarks as booking_remarks,
-                supp.service as supplier_service,
-                u.username as supplier_username,
-                wp.package_name,
-                wp.venue_status,
-                v.venue_id,
-                v.venue_name,
-                v.location as venue_location,
-                v.venue_price,
-                v.description as venue_description,
-                v.venue_capacity,
-                v.image as venue_image,
-                wv.price as booked_venue_price,
-                oi.outfit_details
-            FROM events e
-            JOIN users client ON e.userid = client.userid
-            JOIN wishlist_packages wp ON e.events_id = wp.events_id
-            JOIN wishlist_suppliers ws ON wp.wishlist_id = ws.wishlist_id
-            JOIN suppliers supp ON ws.supplier_id = supp.supplier_id
-            JOIN users u ON supp.userid = u.userid
-            LEFT JOIN wishlist_venues wv ON wp.wishlist_id = wv.wishlist_id
-            LEFT JOIN venues v ON wp.venue_id = v.venue_id OR wv.venue_id = v.venue_id
-            LEFT JOIN outfit_info oi ON wp.wishlist_id = oi.wishlist_id
-            WHERE supp.supplier_id = %s
-            AND UPPER(ws.status) = 'APPROVED'
-            ORDER BY 
-                CASE 
-                    WHEN e.schedule > CURRENT_DATE THEN 1
-                    WHEN e.schedule = CURRENT_DATE THEN 2
-                    ELSE 3
-                END,
-                e.schedule ASC,
-                e.start_time ASC
-        """
-        print(f"DEBUG: Executing query with supplier_id: {supplier_info['supplier_id']}")
-        cursor.execute(query, (supplier_info['supplier_id'],))
+        print(f"DEBUG: Executing query with supplier_id: {supplier_info[2]}")
+        cursor.execute(SUPPLIER_EVENTS_QUERY, (supplier_info[2],))
         
+        columns = [desc[0] for desc in cursor.description]
         events = cursor.fetchall()
         print(f"DEBUG: Raw events count: {len(events)}")
         
         # Convert the results to a list of dictionaries
-        formatted_events = []
-        for event in events:
-            formatted_event = dict(event)
-            
-            # Convert time objects to string format
-            if formatted_event['start_time']:
-                formatted_event['start_time'] = formatted_event['start_time'].strftime('%H:%M:%S')
-            if formatted_event['end_time']:
-                formatted_event['end_time'] = formatted_event['end_time'].strftime('%H:%M:%S')
-            
-            # Convert date object to string format
-            if formatted_event.get('schedule'):
-                formatted_event['schedule'] = formatted_event['schedule'].strftime('%Y-%m-%d')
-            
-            # Format created_at timestamp in outfit details if it exists
-            if formatted_event.get('outfit_details'):
-                for outfit in formatted_event['outfit_details']:
-                    if outfit.get('created_at'):
-                        # Check if created_at is already a string
-                        if not isinstance(outfit['created_at'], str):
-                            outfit['created_at'] = outfit['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Add is_upcoming field by comparing with current date
-            current_date = datetime.now().date()
-            event_date = datetime.strptime(formatted_event['schedule'], '%Y-%m-%d').date() if formatted_event.get('schedule') else None
-            formatted_event['is_upcoming'] = event_date >= current_date if event_date else False
-            
-            formatted_events.append(formatted_event)
+        formatted_events = [_format_supplier_event(dict(zip(columns, event))) for event in events]
 
         print(f"DEBUG: Returning {len(formatted_events)} formatted events")
         cursor.close()
@@ -1853,6 +2301,42 @@ def get_supplier_booked_events(user_email):
         traceback.print_exc()
         return []
 
+
+def iter_supplier_booked_events(supplier_id):
+    """Like get_supplier_booked_events, but by supplier ID and yielded through a server-side cursor."""
+    for columns, rows in stream_query(SUPPLIER_EVENTS_QUERY, (supplier_id,)):
+        for event in rows:
+            yield _format_supplier_event(dict(zip(columns, event)))
+
+
+def _format_supplier_event(formatted_event):
+    """Format the times and dates of a supplier event row and flag upcoming events."""
+    # Convert time objects to string format
+    if formatted_event['start_time']:
+        formatted_event['start_time'] = formatted_event['start_time'].strftime('%H:%M:%S')
+    if formatted_event['end_time']:
+        formatted_event['end_time'] = formatted_event['end_time'].strftime('%H:%M:%S')
+
+    # Convert date object to string format
+    if formatted_event.get('schedule'):
+        formatted_event['schedule'] = formatted_event['schedule'].strftime('%Y-%m-%d')
+
+    # Format created_at timestamp in outfit details if it exists
+    if formatted_event.get('outfit_details'):
+        for outfit in formatted_event['outfit_details']:
+            if outfit.get('created_at'):
+                # Check if created_at is already a string
+                if not isinstance(outfit['created_at'], str):
+                    outfit['created_at'] = outfit['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+
+    # Add is_upcoming field by comparing with current date
+    current_date = datetime.now().date()
+    event_date = datetime.strptime(formatted_event['schedule'], '%Y-%m-%d').date() if formatted_event.get('schedule') else None
+    formatted_event['is_upcoming'] = event_date >= current_date if event_date else False
+
+    return formatted_event
+
+
 def get_gown_package_outfits(gown_package_id):
     """Get all outfits that belong to a specific gown package"""
     conn = get_db_connection()
@@ -1998,6 +2482,104 @@ def get_supplier_availability(supplier_id, start_date=None, end_date=None):
         cursor.close()
         conn.close()
 
+def _scan_supplier_availability(cursor, supplier_id, start_date=None, end_date=None):
+    """
+    Run one ordered scan of a supplier's availability and return (date, is_available, reason) tuples
+    """
+    query = """
+        SELECT date, is_available, reason
+        FROM supplier_availability
+        WHERE supplier_id = %s
+    """
+    params = [supplier_id]
+
+    if start_date:
+        query += " AND date >= %s"
+        params.append(start_date)
+    if end_date:
+        query += " AND date <= %s"
+        params.append(end_date)
+
+    query += " ORDER BY date ASC"
+
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+def get_supplier_availability_runs(supplier_id, start_date=None, end_date=None):
+    """
+    Get supplier availability collapsed into runs of consecutive dates
+    sharing the same is_available/reason.
+    :return: List of dicts with start_date, end_date, days, is_available and reason
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        runs = []
+        current = None
+        for day, is_available, reason in _scan_supplier_availability(cursor, supplier_id, start_date, end_date):
+            if (current and current['is_available'] == is_available and current['reason'] == reason
+                    and (day - current['_last']).days == 1):
+                current['_last'] = day
+                current['days'] += 1
+                continue
+
+            current = {'_first': day, '_last': day, 'days': 1, 'is_available': is_available, 'reason': reason}
+            runs.append(current)
+
+        return [
+            {
+                'start_date': run['_first'],
+                'end_date': run['_last'],
+                'days': run['days'],
+                'is_available': run['is_available'],
+                'reason': run['reason']
+            }
+            for run in runs
+        ]
+    except Exception as e:
+        logger.error(f"Error getting supplier availability runs: {e}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_supplier_availability_bitmap(supplier_id, year):
+    """
+    Get a year-at-a-glance view of supplier availability as two bitmaps.
+    Bit n (least significant bit first within each byte) stands for day n of the
+    year, counting January 1st as day 0. 'available' marks dates explicitly set as
+    available, 'unavailable' marks blocked dates; dates in neither have no record.
+    :return: Dict with year, days and base64-encoded available/unavailable bitmaps
+    """
+    first_day = date(year, 1, 1)
+    last_day = date(year, 12, 31)
+    days_in_year = (last_day - first_day).days + 1
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        available = bytearray((days_in_year + 7) // 8)
+        unavailable = bytearray((days_in_year + 7) // 8)
+        for day, is_available, _reason in _scan_supplier_availability(cursor, supplier_id, first_day, last_day):
+            offset = (day - first_day).days
+            bitmap = available if is_available else unavailable
+            bitmap[offset >> 3] |= 1 << (offset & 7)
+
+        return {
+            'year': year,
+            'days': days_in_year,
+            'available': base64.b64encode(bytes(available)).decode('ascii'),
+            'unavailable': base64.b64encode(bytes(unavailable)).decode('ascii')
+        }
+    except Exception as e:
+        logger.error(f"Error getting supplier availability bitmap: {e}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
 def set_supplier_availability(supplier_id, date, is_available=True, reason=None):
     """
     Set supplier availability for a specific date
@@ -2029,6 +2611,52 @@ def set_supplier_availability(supplier_id, date, is_available=True, reason=None)
         cursor.close()
         conn.close()
 
+def set_supplier_availability_bulk(supplier_id, is_available=True, reason=None,
+                                   start_date=None, end_date=None, dates=None, weekdays=None):
+    """
+    Set supplier availability for a date range or a list of dates in one statement.
+    :param start_date: First date of the range (inclusive), used with end_date
+    :param end_date: Last date of the range (inclusive)
+    :param dates: Explicit list of dates, used instead of a range
+    :param weekdays: Optional list of weekdays to keep (0 = Sunday ... 6 = Saturday)
+    :return: Number of rows inserted or updated
+    """
+    if dates:
+        source = "SELECT DISTINCT d::date AS d FROM unnest(%s::date[]) AS d"
+        source_params = [list(dates)]
+    else:
+        source = "SELECT d::date AS d FROM generate_series(%s::date, %s::date, interval '1 day') AS d"
+        source_params = [start_date, end_date]
+
+    query = f"""
+        INSERT INTO supplier_availability (supplier_id, date, is_available, reason)
+        SELECT %s, days.d, %s, %s
+        FROM ({source}) AS days
+        WHERE %s::int[] IS NULL OR EXTRACT(DOW FROM days.d)::int = ANY(%s::int[])
+        ON CONFLICT (supplier_id, date)
+        DO UPDATE SET
+            is_available = EXCLUDED.is_available,
+            reason = EXCLUDED.reason,
+            updated_at = CURRENT_TIMESTAMP
+    """
+    weekday_mask = list(weekdays) if weekdays else None
+    params = [supplier_id, is_available, reason] + source_params + [weekday_mask, weekday_mask]
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        rows_written = cursor.rowcount
+        conn.commit()
+        return rows_written
+    except Exception as e:
+        logger.error(f"Error setting supplier availability in bulk: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
 def delete_supplier_availability(supplier_id, date):
     """
     Delete supplier availability for a specific date
@@ -2056,14 +2684,25 @@ def delete_supplier_availability(supplier_id, date):
 
 def get_supplier_id_by_email(email):
     """
-    Get supplier ID by email
+    Get supplier ID by email, memoized in identity_cache
+    """
+    cached = identity_cache.get_or_load(
+        ('supplier_id', email),
+        lambda: _load_supplier_by_email(email),
+        tag_of=lambda supplier: supplier[1]
+    )
+    return cached[0] if cached else None
+
+def _load_supplier_by_email(email):
+    """
+    Get (supplier_id, userid) by email; the userid tags the cache entry
     """
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
         query = """
-            SELECT s.supplier_id 
+            SELECT s.supplier_id, s.userid
             FROM suppliers s
             JOIN users u ON s.userid = u.userid
             WHERE u.email = %s
@@ -2072,10 +2711,81 @@ def get_supplier_id_by_email(email):
         cursor.execute(query, (email,))
         result = cursor.fetchone()
         
-        return result[0] if result else None
+        return (result[0], result[1]) if result else None
     except Exception as e:
         logger.error(f"Error getting supplier ID by email: {e}")
         raise
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+def revoke_token(jti, userid=None, expires_at=None):
+    """
+    Record a revoked JWT by its jti.
+    :param expires_at: When the token would have expired anyway (None for non-expiring tokens)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            INSERT INTO revoked_tokens (jti, userid, expires_at)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (jti) DO NOTHING
+        """, (jti, userid, expires_at))
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error revoking token: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_revoked_tokens_since(since=None):
+    """
+    Get revocations that have not expired yet, optionally only those recorded after since.
+    :param since: Lower bound on revoked_at, or None for all of them
+    :return: List of (revoked_at, jti) tuples ordered by revoked_at
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(f"""
+            SELECT revoked_at, jti
+            FROM revoked_tokens
+            WHERE (expires_at IS NULL OR expires_at > NOW())
+            {'' if since is None else 'AND revoked_at > %s'}
+            ORDER BY revoked_at
+        """, () if since is None else (since,))
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_catalog_version():
+    """
+    Get the catalog version, which database triggers bump whenever a catalog table
+    (packages, venues, outfits, suppliers, ...) changes.
+    :return: Version number, or None if it could not be read
+    """
+    return catalog_version_cache.get_or_load('catalog_version', _load_catalog_version)
+
+
+def _load_catalog_version():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT version FROM catalog_version")
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        logger.error(f"Error reading catalog version: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,181 @@
+# passwords.py
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# Work factor for new hashes; stored hashes with a lower cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+
+# bcrypt releases the GIL, so a small thread pool bounds how many cores
+# hashing can occupy while the rest of the worker keeps serving requests
+HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+HASH_QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', 32))
+HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+# bcrypt only looks at the first 72 bytes of a password
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool is saturated and a request should be retried later."""
+
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+_stats_lock = threading.Lock()
+_stats = {}
+# Hash of a random password at BCRYPT_ROUNDS, created on first use by dummy_password_hash()
+_dummy_hash = None
+_dummy_lock = threading.Lock()
+
+
+def hash_password(password):
+    """
+    Hash a password with bcrypt on the hashing pool.
+    :return: bcrypt hash as a string
+    """
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    hashed = _run('hash', bcrypt.hashpw, _encode(password), salt)
+    return hashed.decode('ascii')
+
+
+def hash_passwords(passwords):
+    """
+    Hash many passwords for bulk imports. Waits for pool capacity instead of
+    failing when it is busy, and keeps at most HASH_WORKERS of its own jobs in
+    flight so logins can still get a slot in the queue.
+    :return: List of bcrypt hashes in the same order
+    """
+    in_flight = threading.BoundedSemaphore(HASH_WORKERS)
+    futures = []
+    for password in passwords:
+        in_flight.acquire()
+        _slots.acquire()
+        started = time.perf_counter()
+        future = _executor.submit(bcrypt.hashpw, _encode(password), bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+        def release(_future, started=started):
+            _slots.release()
+            in_flight.release()
+            _record('hash', (time.perf_counter() - started) * 1000)
+
+        future.add_done_callback(release)
+        futures.append(future)
+    return [future.result().decode('ascii') for future in futures]
+
+
+def verify_password(password, stored_hash):
+    """
+    Verify a password against a stored bcrypt or legacy unsalted SHA-256 hash.
+    :return: Tuple (is_valid, needs_rehash); needs_rehash is True for legacy
+             hashes and for bcrypt hashes below the configured work factor
+    """
+    if not stored_hash:
+        return False, False
+
+    if is_legacy_hash(stored_hash):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        is_valid = hmac.compare_digest(legacy, stored_hash)
+        return is_valid, is_valid
+
+    try:
+        is_valid = _run('verify', bcrypt.checkpw, _encode(password), stored_hash.encode('ascii'))
+    except ValueError:
+        logger.warning("Stored password hash is not a valid bcrypt hash")
+        return False, False
+    return is_valid, is_valid and _rounds(stored_hash) < BCRYPT_ROUNDS
+
+
+def dummy_password_hash():
+    """
+    A bcrypt hash at BCRYPT_ROUNDS that no password matches. Logins naming no user are
+    verified against it, so they take as long as logins with a wrong password and the
+    response time does not tell which accounts exist.
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        with _dummy_lock:
+            if _dummy_hash is None:
+                _dummy_hash = hash_password(secrets.token_hex(32))
+    return _dummy_hash
+
+
+def is_legacy_hash(stored_hash):
+    """Legacy hashes are plain hex SHA-256 digests."""
+    return len(stored_hash) == 64 and all(c in '0123456789abcdef' for c in stored_hash)
+
+
+def hashing_stats():
+    """Count and latency (queue wait included) of hashing operations in this process."""
+    with _stats_lock:
+        return {
+            'rounds': BCRYPT_ROUNDS,
+            'workers': HASH_WORKERS,
+            'queue_limit': HASH_QUEUE_LIMIT,
+            'operations': {
+                name: dict(
+                    op,
+                    total_ms=round(op['total_ms'], 2),
+                    max_ms=round(op['max_ms'], 2),
+                    avg_ms=round(op['total_ms'] / op['count'], 2) if op['count'] else None
+                )
+                for name, op in _stats.items()
+            }
+        }
+
+
+def _run(name, fn, *args):
+    if not _slots.acquire(blocking=False):
+        _record(name, None, rejected=True)
+        raise PasswordHasherBusy("Password hashing is busy, please retry")
+
+    started = time.perf_counter()
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+
+    def release(_future):
+        # The slot is held until the job has run, even if the caller gave up waiting,
+        # so the slot count keeps bounding the queued work
+        _slots.release()
+        _record(name, (time.perf_counter() - started) * 1000)
+
+    future.add_done_callback(release)
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except FutureTimeoutError:
+        raise PasswordHasherBusy("Password hashing timed out, please retry")
+
+
+def _record(name, elapsed_ms, rejected=False):
+    with _stats_lock:
+        op = _stats.setdefault(name, {'count': 0, 'rejected': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        if rejected:
+            op['rejected'] += 1
+            return
+        op['count'] += 1
+        op['total_ms'] += elapsed_ms
+        op['max_ms'] = max(op['max_ms'], elapsed_ms)
+
+
+def _encode(password):
+    return password.encode('utf-8')[:BCRYPT_MAX_PASSWORD_BYTES]
+
+
+def _rounds(stored_hash):
+    # bcrypt hashes look like $2b$12$<salt+digest>
+    try:
+        return int(stored_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return 0
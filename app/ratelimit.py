@@ -0,0 +1,223 @@
+# ratelimit.py
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+except ImportError:  # optional shared backend
+    redis = None
+
+
+class MemoryBackend:
+    """
+    In-process sliding-window counters. Used on its own for a single worker and as the
+    local stand-in whenever no shared backend is configured or reachable.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = {}  # key -> [window_index, current_count, previous_count]
+        self._lock = threading.Lock()
+
+    def hit(self, key, window, limit, now):
+        """
+        Count one attempt for key unless the sliding-window estimate is already at limit.
+        :return: Tuple (allowed, previous_count, current_count, window_index),
+                 counts as they were before this attempt
+        """
+        index = int(now // window)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                if len(self._counters) >= self.max_keys:
+                    self._prune(index)
+                counter = self._counters[key] = [index, 0, 0]
+            elif counter[0] != index:
+                counter[2] = counter[1] if counter[0] == index - 1 else 0
+                counter[1] = 0
+                counter[0] = index
+
+            previous, current = counter[2], counter[1]
+            if _estimate(previous, current, window, now) >= limit:
+                return False, previous, current, index
+            counter[1] += 1
+            return True, previous, current, index
+
+    def _prune(self, index):
+        # Caller must hold the lock; counters older than the previous window no longer matter
+        for key in [k for k, c in self._counters.items() if c[0] < index - 1]:
+            del self._counters[key]
+
+
+class RedisBackend:
+    """Sliding-window counters shared by every worker through Redis."""
+
+    # Check and count in one atomic step, so concurrent attempts cannot all pass the check.
+    # KEYS: previous and current window counters; ARGV: elapsed fraction of the current
+    # window, limit, counter TTL. Returns {allowed, previous_count, current_count}.
+    HIT_SCRIPT = """
+        local previous = tonumber(redis.call('GET', KEYS[1]) or '0')
+        local current = tonumber(redis.call('GET', KEYS[2]) or '0')
+        if previous * (1 - tonumber(ARGV[1])) + current >= tonumber(ARGV[2]) then
+            return {0, previous, current}
+        end
+        redis.call('INCR', KEYS[2])
+        redis.call('EXPIRE', KEYS[2], ARGV[3])
+        return {1, previous, current}
+    """
+
+    def __init__(self, url):
+        self._client = redis.Redis.from_url(url)
+        self._hit = self._client.register_script(self.HIT_SCRIPT)
+
+    def hit(self, key, window, limit, now):
+        index = int(now // window)
+        # The {key} hash tag keeps both counters in one Redis Cluster slot, as the script requires
+        allowed, previous, current = self._hit(
+            keys=[f"ratelimit:{{{key}}}:{index - 1}", f"ratelimit:{{{key}}}:{index}"],
+            args=[repr((now % window) / window), limit, int(window * 2) + 1]
+        )
+        return bool(allowed), int(previous), int(current), index
+
+
+class SlidingWindowLimiter:
+    """
+    Allows `limit` attempts per key within a rolling `window` seconds, using the
+    weighted previous/current fixed-window approximation of a sliding log.
+    Falls back to the local backend if the shared one fails.
+    """
+
+    def __init__(self, name, limit, window, backend, fallback=None, max_tracked_keys=1000):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.backend = backend
+        self.fallback = fallback or backend
+        self.max_tracked_keys = max_tracked_keys
+        self._key_stats = OrderedDict()  # key -> {'allowed': n, 'rejected': n}
+        self._totals = {'allowed': 0, 'rejected': 0, 'backend_errors': 0}
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """
+        Record an attempt for key.
+        :return: Tuple (allowed, retry_after_seconds)
+        """
+        now = time.time()
+        key = f"{self.name}:{key}"
+        try:
+            allowed, previous, current, index = self.backend.hit(key, self.window, self.limit, now)
+        except Exception as e:
+            logger.error(f"Rate limit backend error for {self.name}: {e}")
+            self._count('backend_errors')
+            allowed, previous, current, index = self.fallback.hit(key, self.window, self.limit, now)
+
+        self._count('allowed' if allowed else 'rejected', key)
+        if allowed:
+            return True, 0
+        return False, max(1, math.ceil(self._free_at(previous, current, index) - now))
+
+    def _free_at(self, previous, current, index):
+        # When the estimate drops below the limit, assuming no further attempts are counted
+        window_start = index * self.window
+        if self.limit <= 0:
+            # Nothing is ever allowed; point the client at the next window
+            return window_start + self.window
+        if current < self.limit:
+            return window_start + self.window * (1 - (self.limit - current) / previous)
+        return window_start + self.window * (2 - self.limit / current)
+
+    def stats(self, top=20):
+        with self._lock:
+            busiest = sorted(self._key_stats.items(), key=lambda item: item[1]['rejected'], reverse=True)[:top]
+            return dict(
+                self._totals,
+                limit=self.limit,
+                window_seconds=self.window,
+                tracked_keys=len(self._key_stats),
+                top_keys=[dict(counts, key=key) for key, counts in busiest]
+            )
+
+    def _count(self, outcome, key=None):
+        with self._lock:
+            self._totals[outcome] += 1
+            if key is None:
+                return
+            counts = self._key_stats.get(key)
+            if counts is None:
+                counts = self._key_stats[key] = {'allowed': 0, 'rejected': 0}
+                if len(self._key_stats) > self.max_tracked_keys:
+                    self._key_stats.popitem(last=False)
+            else:
+                self._key_stats.move_to_end(key)
+            counts[outcome] += 1
+
+
+def _estimate(previous_count, current_count, window, now):
+    elapsed = (now % window) / window
+    return previous_count * (1 - elapsed) + current_count
+
+
+def _parse_rate(value, default):
+    # Rates are configured as "<attempts>/<seconds>", e.g. "10/300"
+    try:
+        attempts, seconds = (value or default).split('/')
+        return int(attempts), int(seconds)
+    except ValueError:
+        logger.error(f"Invalid rate limit {value!r}, using {default}")
+        return _parse_rate(default, default)
+
+
+def _create_backend():
+    local = MemoryBackend()
+    url = os.getenv('RATELIMIT_STORAGE_URL')
+    if not url:
+        return local, local
+    if redis is None:
+        logger.warning("RATELIMIT_STORAGE_URL is set but redis is not installed; using in-memory rate limits")
+        return local, local
+    return RedisBackend(url), local
+
+
+_backend, _local_backend = _create_backend()
+
+login_identifier_limiter = SlidingWindowLimiter(
+    'login-identifier', *_parse_rate(os.getenv('LOGIN_IDENTIFIER_RATE_LIMIT'), '10/300'),
+    backend=_backend, fallback=_local_backend
+)
+login_ip_limiter = SlidingWindowLimiter(
+    'login-ip', *_parse_rate(os.getenv('LOGIN_IP_RATE_LIMIT'), '30/60'),
+    backend=_backend, fallback=_local_backend
+)
+register_ip_limiter = SlidingWindowLimiter(
+    'register-ip', *_parse_rate(os.getenv('REGISTER_IP_RATE_LIMIT'), '10/3600'),
+    backend=_backend, fallback=_local_backend
+)
+
+# Number of reverse proxies in front of the app that append to X-Forwarded-For
+TRUSTED_PROXY_COUNT = int(os.getenv('RATELIMIT_TRUSTED_PROXIES', 0))
+
+
+def client_ip(request):
+    """
+    Client address for rate limiting. With trusted proxies, take the entry the
+    outermost trusted proxy appended to X-Forwarded-For, which clients cannot forge.
+    """
+    if TRUSTED_PROXY_COUNT:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_COUNT:
+            return forwarded[-TRUSTED_PROXY_COUNT]
+    return request.remote_addr or 'unknown'
+
+
+def rate_limit_stats():
+    return {
+        limiter.name: limiter.stats()
+        for limiter in (login_identifier_limiter, login_ip_limiter, register_ip_limiter)
+    }
@@ -0,0 +1,156 @@
+# revocation.py
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from datetime import timedelta
+
+from .models import get_revoked_tokens_since, revoke_token
+
+logger = logging.getLogger(__name__)
+
+# How often each worker pulls newly revoked jtis from the revoked_tokens table
+REVOCATION_REFRESH_INTERVAL = float(os.getenv('REVOCATION_REFRESH_INTERVAL', 5))
+# Each refresh re-reads revocations this much older than the newest one seen. revoked_at is
+# taken when the revoking transaction starts, so rows can become visible out of order
+REVOCATION_REFRESH_OVERLAP = float(os.getenv('REVOCATION_REFRESH_OVERLAP', 60))
+# Backstop: reload every unexpired revocation this often
+REVOCATION_FULL_RELOAD_INTERVAL = float(os.getenv('REVOCATION_FULL_RELOAD_INTERVAL', 600))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; never returns a false negative."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1)
+        # Optimal bit count and number of hashes for the target false positive rate
+        self.size = max(64, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, value):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def _positions(self, value):
+        # Double hashing: two 64-bit halves of one digest generate every position
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+
+class RevocationStore:
+    """
+    Revoked token ids, persisted in the revoked_tokens table and mirrored in memory.
+    Lookups go through a Bloom filter first, so tokens that were never revoked are
+    answered without touching the exact set or the database. Each worker process loads
+    every revocation before answering its first lookup, then a background thread pulls
+    recent ones by revoked_at, with an overlap window, and periodically reloads them all.
+    """
+
+    def __init__(self, refresh_interval=REVOCATION_REFRESH_INTERVAL, initial_capacity=10000):
+        self.refresh_interval = refresh_interval
+        self._revoked = set()
+        self._bloom = BloomFilter(initial_capacity)
+        self._last_seen = None  # newest revoked_at loaded
+        self._last_full_refresh = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded_pid = None
+        self._stats = {'checks': 0, 'bloom_positives': 0, 'revoked_hits': 0, 'refreshes': 0, 'refresh_errors': 0}
+        self._last_refresh = None
+
+    def is_revoked(self, jti):
+        """Raises if this process has not been able to load the revocations yet."""
+        self._ensure_loaded()
+        with self._lock:
+            self._stats['checks'] += 1
+            if jti not in self._bloom:
+                return False
+            self._stats['bloom_positives'] += 1
+            revoked = jti in self._revoked
+            if revoked:
+                self._stats['revoked_hits'] += 1
+            return revoked
+
+    def revoke(self, jti, userid=None, expires_at=None):
+        """Persist a revocation and apply it to this worker immediately."""
+        revoke_token(jti, userid, expires_at)
+        with self._lock:
+            self._add(jti)
+
+    def refresh(self, full=False):
+        """
+        Load revocations recorded since shortly before the newest one already loaded,
+        or all of them if full. Rows seen before are skipped by _add.
+        """
+        since = None
+        if not full and self._last_seen is not None:
+            since = self._last_seen - timedelta(seconds=REVOCATION_REFRESH_OVERLAP)
+        rows = get_revoked_tokens_since(since)
+        with self._lock:
+            for revoked_at, jti in rows:
+                self._add(jti)
+                if self._last_seen is None or revoked_at > self._last_seen:
+                    self._last_seen = revoked_at
+            self._stats['refreshes'] += 1
+            self._last_refresh = time.time()
+            if since is None:
+                self._last_full_refresh = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                revoked_tokens=len(self._revoked),
+                bloom_bits=self._bloom.size,
+                bloom_hashes=self._bloom.hashes,
+                last_revoked_at=self._last_seen.isoformat() if self._last_seen else None,
+                last_refresh=self._last_refresh
+            )
+
+    def _add(self, jti):
+        # Caller must hold the lock
+        if jti in self._revoked:
+            return
+        self._revoked.add(jti)
+        if len(self._revoked) > self._bloom.capacity:
+            # Rebuild with room to grow before the false positive rate degrades
+            bloom = BloomFilter(self._bloom.capacity * 2)
+            for revoked in self._revoked:
+                bloom.add(revoked)
+            self._bloom = bloom
+        else:
+            self._bloom.add(jti)
+
+    def _ensure_loaded(self):
+        # Once per process, so every forked gunicorn worker loads the set and starts its own
+        # refresher. Until the first load succeeds lookups raise rather than accept revoked tokens
+        if self._loaded_pid == os.getpid():
+            return
+        with self._load_lock:
+            if self._loaded_pid == os.getpid():
+                return
+            self.refresh(full=True)
+            self._loaded_pid = os.getpid()
+        threading.Thread(target=self._refresh_loop, name='token-revocation-refresh', daemon=True).start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                full = time.monotonic() - self._last_full_refresh >= REVOCATION_FULL_RELOAD_INTERVAL
+                self.refresh(full=full)
+            except Exception as e:
+                with self._lock:
+                    self._stats['refresh_errors'] += 1
+                logger.error(f"Error refreshing revoked tokens: {e}")
+
+
+revocation_store = RevocationStore()
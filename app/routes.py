@@ -1,9 +1,9 @@
 #routes.py
-from flask import request, jsonify, send_from_directory
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import request, jsonify, redirect, send_file
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 from .models import (
-    check_user, create_user, get_user_wishlist, 
-    get_user_id_by_email, create_outfit, get_outfits, get_outfit_by_id, 
+    check_user, create_user, bulk_create_users, get_user_wishlist, 
+    create_outfit, get_outfits, get_outfit_by_id, 
     book_outfit, get_booked_wishlist_by_user, delete_booked_wishlist, 
     get_package_details_by_id, get_booked_outfits_by_user,  
     get_available_suppliers, get_available_venues, get_available_gown_packages, 
@@ -12,20 +12,229 @@ from .models import (
     change_password, get_db_connection, update_user_profile_picture, get_client_packages,
     get_supplier_booked_events, get_gown_package_outfits, add_event_feedback, get_event_feedback,
     update_user_profile, get_supplier_availability, set_supplier_availability, 
-    delete_supplier_availability, get_supplier_id_by_email
+    delete_supplier_availability, set_supplier_availability_bulk,
+    get_supplier_availability_runs, get_supplier_availability_bitmap, get_package_availability,
+    get_next_free_dates, identity_cache, count_profile_image_references,
+    iter_outfits, iter_booked_outfits_by_user, iter_supplier_booked_events, iter_user_wishlist,
+    OUTFIT_FIELDS, VENUE_FIELDS, SUPPLIER_FIELDS
 )
+from .images import (
+    remove_profile_image, schedule_variants, resolve_variant, stat_image, image_manifest,
+    is_immutable_name, image_etag, image_mimetype, offload_headers, stat_cache, IMAGE_MAX_AGE, IMMUTABLE_MAX_AGE
+)
+from .storage import storage, PROFILE_FOLDER, OUTFIT_FOLDER, VENUE_FOLDER, OUTFIT_PACKAGE_BG_FOLDER
+
+from .uploads import ProfileImageUpload
+from .compression import catalog_cached, catalog_response_cache, CatalogSnapshot
+from .db import db_session
+from .json_provider import json_bytes
+from .batch import resolve_batch_path, run_batch, BATCH_ENDPOINTS, MAX_BATCH_REQUESTS
+from .passwords import PasswordHasherBusy, hashing_stats
+from .revocation import revocation_store
+from .ratelimit import (
+    login_identifier_limiter, login_ip_limiter, register_ip_limiter, client_ip, rate_limit_stats
+)
+from .auth import identity_claims, current_user_id, current_supplier_id, current_user_is_admin
 import logging
 import jwt
 from functools import wraps
 import os
-from datetime import datetime, date, time
+from datetime import datetime, date, time, timezone
+from werkzeug.exceptions import NotFound
+from werkzeug.http import is_resource_modified
 from werkzeug.utils import secure_filename
-import uuid
 
 logging.basicConfig(level=logging.DEBUG)
 
+# Upper bound on the number of days a single availability request may write
+MAX_AVAILABILITY_BATCH_DAYS = 731
+
+# Limits for the next-free-dates search
+MAX_FREE_DATES = 50
+MAX_FREE_DATE_HORIZON_DAYS = 1096
+
+# Largest batch accepted by the admin user import. Rows with a password_hash only cost the COPY,
+# but each plain password is hashed inside the request: at bcrypt cost 12 on two hashing threads
+# that is about 8 per second, so 100 stays well inside a 30-second worker timeout
+MAX_USER_IMPORT = 10000
+MAX_USER_IMPORT_PASSWORDS = int(os.getenv('MAX_USER_IMPORT_PASSWORDS', 100))
+
+# Image kinds accepted by the image manifest endpoint, and how many names one request may list
+IMAGE_MANIFEST_FOLDERS = {
+    'outfit': OUTFIT_FOLDER,
+    'venue': VENUE_FOLDER,
+    'package_bg': OUTFIT_PACKAGE_BG_FOLDER,
+    'profile': PROFILE_FOLDER
+}
+MAX_MANIFEST_IMAGES = 100
+
+# ?fields= on /created-packages: output field -> get_client_packages fields it is built from
+CREATED_PACKAGE_FIELDS = {
+    'package_id': ('package_id',),
+    'package_name': ('package_name',),
+    'capacity': ('capacity',),
+    'description': ('description',),
+    'additional_capacity_charges': ('additional_capacity_charges',),
+    'charge_unit': ('charge_unit',),
+    'total_price': ('total_price',),
+    'status': ('status',),
+    'venue': ('venue_id', 'venue_name'),
+    'event_type': ('event_type_name',),
+    'gown_package': ('gown_package_name',),
+    'suppliers': ('suppliers',),
+    'additional_services': ('additional_services',)
+}
+
+# ?stream=1 responses are written in pieces of about this size once the first item is out
+STREAM_FLUSH_BYTES = 16 * 1024
+
+
+def _format_created_package(package):
+    """Shape a get_client_packages row the way /created-packages and /api/bootstrap return it."""
+    # Process venue image path if venue exists
+    venue_image = None
+    if package.get('venue_id'):
+        venue_image = package.get('venue_image')
+        if venue_image:
+            # Handle different path formats
+            if '\\' in venue_image:
+                venue_image = venue_image.split('\\')[-1]
+            elif '/' in venue_image:
+                venue_image = venue_image.split('/')[-1]
+
+            # If the image is one of our static images, use direct static path
+            static_images = ['grandballroom.png', 'hogwarts.png', 'oceanview.png', 'paseo.png', 'sealavie.png']
+            if any(venue_image.endswith(img) for img in static_images):
+                venue_image = f'/img/venues-img/{venue_image}'
+            # For uploaded images, use API endpoint
+            else:
+                venue_image = f'/api/venue-image/{venue_image}'
+
+    formatted_package = {
+        'package_id': package.get('package_id'),
+        'package_name': package.get('package_name'),
+        'capacity': package.get('capacity'),
+        'description': package.get('description'),
+        'additional_capacity_charges': float(package['additional_capacity_charges']) if package.get('additional_capacity_charges') else 0,
+        'charge_unit': package.get('charge_unit'),
+        'total_price': float(package['total_price']) if package.get('total_price') else 0,
+        'status': package.get('status'),
+        'venue': {
+            'name': package['venue_name'],
+            'location': package.get('location'),
+            'price': float(package.get('venue_price', 0)),
+            'capacity': package.get('venue_capacity'),
+            'description': package.get('venue_description'),
+            'image': venue_image
+        } if package.get('venue_name') else None,
+        'event_type': package.get('event_type_name'),
+        'gown_package': {
+            'name': package.get('gown_package_name'),
+            'price': float(package.get('gown_package_price', 0)),
+            'description': package.get('gown_package_description')
+        } if package.get('gown_package_name') else None,
+        'suppliers': package.get('suppliers', []),
+        'additional_services': package.get('additional_services', [])
+    }
+    return formatted_package
+
+
+def _build_bootstrap():
+    """Catalog data the client app loads on startup; the same for every user."""
+    with db_session():
+        return {
+            'event_types': get_event_types(),
+            'venues': get_available_venues(),
+            'gown_packages': get_available_gown_packages(),
+            'services': get_all_additional_services(),
+            'suppliers': get_available_suppliers(),
+            'packages': [_format_created_package(package) for package in get_client_packages()]
+        }
+
+
+# Prebuilt /api/bootstrap response, rebuilt in the background when the catalog version changes
+bootstrap_snapshot = CatalogSnapshot('bootstrap', _build_bootstrap)
+
+
 def init_routes(app):
 
+    def _rate_limited_response(retry_after):
+        response = jsonify({'message': 'Too many attempts. Please try again later.'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+
+    def _hasher_busy_response():
+        response = jsonify({'message': 'Server is busy, please try again shortly.'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+    def _requested_fields(allowed):
+        """
+        Parse the ?fields=a,b sparse fieldset against a whitelist.
+        :return: Tuple (set of fields, or None for all of them; 400 response or None)
+        """
+        value = request.args.get('fields')
+        if value is None:
+            return None, None
+        fields = {field.strip() for field in value.split(',') if field.strip()}
+        unknown = fields - set(allowed)
+        if not fields or unknown:
+            return None, (jsonify({
+                'message': f"Unknown fields: {', '.join(sorted(unknown)) or '(none given)'}. "
+                           f"Allowed: {', '.join(allowed)}"
+            }), 400)
+        return fields, None
+
+    def _requested_columnar():
+        """
+        Parse ?format=columnar, which lays a list out as {columns, data: {column: [values]}}.
+        :return: Tuple (True if requested; 400 response or None)
+        """
+        value = request.args.get('format')
+        if value is None or value == 'columnar':
+            return value == 'columnar', None
+        return False, (jsonify({'message': f"Unknown format: {value}. Allowed: columnar"}), 400)
+
+    def _wants_stream():
+        return request.args.get('stream', '').lower() in ('1', 'true')
+
+    def _stream_json(items, prefix=b'[', suffix=b']'):
+        """
+        Stream a JSON array whose items are produced while the response is being sent.
+        The first item is fetched up front, so a failing query still gets an error
+        response; an error after that is logged and leaves the body truncated.
+        :param items: Iterable of items, e.g. a generator over a server-side cursor
+        :param prefix: Bytes written before the array, e.g. to wrap it in an object
+        :param suffix: Bytes written after it
+        """
+        items = iter(items)
+        first = next(items, None)
+        endpoint = request.endpoint
+
+        def generate():
+            try:
+                if first is None:
+                    yield prefix + suffix
+                    return
+                yield prefix + json_bytes(first)
+                buffer = bytearray()
+                for item in items:
+                    buffer += b','
+                    buffer += json_bytes(item)
+                    if len(buffer) >= STREAM_FLUSH_BYTES:
+                        yield bytes(buffer)
+                        buffer.clear()
+                buffer += suffix
+                yield bytes(buffer)
+            except Exception as e:
+                app.logger.error(f"Error while streaming {endpoint}: {e}")
+            finally:
+                # Ends the server-side cursor and its connection if the client went away early
+                if hasattr(items, 'close'):
+                    items.close()
+
+        return app.response_class(generate(), mimetype='application/json')
+
     @app.route('/login', methods=['POST'])
     def login():
         try:
@@ -37,12 +246,24 @@ def init_routes(app):
             # Check if identifier and password are provided
             if not identifier or not password:
                 return jsonify({'message': 'Username/Email and password are required!'}), 400
+            if not isinstance(identifier, str) or not isinstance(password, str):
+                return jsonify({'message': 'Username/Email and password must be strings!'}), 400
+
+            # Throttle by client IP and by account before touching the database
+            for limiter, key in ((login_ip_limiter, client_ip(request)),
+                                 (login_identifier_limiter, identifier.strip().lower())):
+                allowed, retry_after = limiter.hit(key)
+                if not allowed:
+                    return _rate_limited_response(retry_after)
 
             # Check the user credentials
-            is_valid, user_type = check_user(identifier, password)
+            is_valid, user_type, userid, supplier_id = check_user(identifier, password)
             if is_valid:
-                # Generate JWT token with additional claims
-                access_token = create_access_token(identity=identifier, additional_claims={"user_type": user_type})
+                # Generate JWT token with the user's type and ids as additional claims
+                access_token = create_access_token(
+                    identity=identifier,
+                    additional_claims=identity_claims(user_type, userid, supplier_id)
+                )
 
                 return jsonify({
                     'message': 'Login successful!',
@@ -52,12 +273,18 @@ def init_routes(app):
             else:
                 return jsonify({'message': 'Invalid username/email or password.'}), 401
 
+        except PasswordHasherBusy:
+            return _hasher_busy_response()
         except Exception as e:
             print(f"Error during login: {e}")
             return jsonify({'message': 'An error occurred during login.'}), 500
 
     @app.route('/register', methods=['POST'])
     def register():
+        allowed, retry_after = register_ip_limiter.hit(client_ip(request))
+        if not allowed:
+            return _rate_limited_response(retry_after)
+
         data = request.json
         print(data)  # Log the incoming data for debugging
         first_name = data.get('firstName')
@@ -74,16 +301,81 @@ def init_routes(app):
             return jsonify({'message': 'All fields are required!'}), 400
 
         # Attempt to create the user
-        if create_user(first_name, last_name, username, email, contact_number, password, user_type, address):
+        try:
+            created, conflict_field = create_user(first_name, last_name, username, email, contact_number, password, user_type, address)
+        except PasswordHasherBusy:
+            return _hasher_busy_response()
+        if created:
             return jsonify({'message': 'Registration successful!'}), 201
+        elif conflict_field == 'username':
+            return jsonify({'message': 'Username already exists!', 'field': 'username'}), 409
         else:
-            return jsonify({'message': 'Email already exists!'}), 409
+            return jsonify({'message': 'Email already exists!', 'field': 'email'}), 409
+
+    @app.route('/api/admin/users/import', methods=['POST'])
+    @jwt_required()
+    def import_users():
+        if not current_user_is_admin():
+            return jsonify({'message': 'Admin access required'}), 403
+
+        users = (request.get_json(silent=True) or {}).get('users')
+        if not isinstance(users, list) or not users:
+            return jsonify({'message': 'users must be a non-empty list'}), 400
+        if len(users) > MAX_USER_IMPORT:
+            return jsonify({'message': f'At most {MAX_USER_IMPORT} users can be imported at once'}), 400
+
+        required_fields = ['firstname', 'lastname', 'username', 'email', 'contactnumber']
+        for index, user in enumerate(users):
+            if not isinstance(user, dict) or not all(user.get(field) for field in required_fields) \
+                    or not (user.get('password') or user.get('password_hash')):
+                return jsonify({
+                    'message': f'User at index {index} is missing required fields',
+                    'required': required_fields + ['password or password_hash']
+                }), 400
+            # Non-string hashes are left to bulk_create_users, which reports those rows as skipped
+            password_hash = user.get('password_hash')
+            if password_hash and isinstance(password_hash, str) and not password_hash.startswith('$2'):
+                return jsonify({'message': f'User at index {index} has a password_hash that is not bcrypt'}), 400
+
+        plain_passwords = sum(1 for user in users if not user.get('password_hash'))
+        if plain_passwords > MAX_USER_IMPORT_PASSWORDS:
+            return jsonify({
+                'message': f'At most {MAX_USER_IMPORT_PASSWORDS} users with a plain password can be imported at once; '
+                           f'split the import or provide bcrypt password_hash values'
+            }), 400
+
+        try:
+            created, skipped = bulk_create_users(users)
+            return jsonify({
+                'status': 'success',
+                'created': len(created),
+                'skipped': skipped
+            }), 201
+        except Exception as e:
+            app.logger.error(f"Error importing users: {e}")
+            return jsonify({'message': 'An error occurred while importing users'}), 500
 
     @app.route('/available-suppliers', methods=['GET'])
     @jwt_required()
     def get_available_suppliers_route():
         try:
-            suppliers = get_available_suppliers()
+            event_date = request.args.get('date')
+            if event_date:
+                try:
+                    event_date = datetime.strptime(event_date, '%Y-%m-%d').date()
+                except ValueError:
+                    return jsonify({'message': 'Invalid date. Expected YYYY-MM-DD'}), 400
+
+            fields, error = _requested_fields(SUPPLIER_FIELDS)
+            if error:
+                return error
+            columnar, error = _requested_columnar()
+            if error:
+                return error
+
+            suppliers = get_available_suppliers(
+                date=event_date, service=request.args.get('service'), fields=fields, columnar=columnar
+            )
             return jsonify(suppliers), 200
         except Exception as e:
             app.logger.error(f"Error fetching available suppliers: {e}")
@@ -91,15 +383,24 @@ def init_routes(app):
 
     @app.route('/available-venues', methods=['GET'])
     @jwt_required()
+    @catalog_cached
     def get_available_venues_route():
         try:
-            venues = get_available_venues()
+            fields, error = _requested_fields(VENUE_FIELDS)
+            if error:
+                return error
+            columnar, error = _requested_columnar()
+            if error:
+                return error
+
+            venues = get_available_venues(fields=fields, columnar=columnar)
             return jsonify(venues), 200
         except Exception as e:
             app.logger.error(f"Error fetching available venues: {e}")
             return jsonify({'message': 'An error occurred while fetching available venues'}), 500
 
     @app.route('/available-gown-packages', methods=['GET'])
+    @catalog_cached
     def get_available_gown_packages_route():
         try:
             gown_packages = get_available_gown_packages()
@@ -120,12 +421,82 @@ def init_routes(app):
             app.logger.error(f"Error fetching package details: {e}")
             return jsonify({'message': 'An error occurred while fetching package details'}), 500
 
+    @app.route('/api/packages/<int:package_id>/availability', methods=['GET'])
+    @jwt_required()
+    def get_package_availability_route(package_id):
+        try:
+            event_date = request.args.get('date')
+            if not event_date:
+                return jsonify({'message': 'date is required'}), 400
+            try:
+                event_date = datetime.strptime(event_date, '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({'message': 'Invalid date. Expected YYYY-MM-DD'}), 400
+
+            availability = get_package_availability(package_id, event_date)
+            if availability is None:
+                return jsonify({'message': 'Package not found'}), 404
+            return jsonify(availability), 200
+        except Exception as e:
+            app.logger.error(f"Error checking package availability: {e}")
+            return jsonify({'message': 'An error occurred while checking package availability'}), 500
+
+    @app.route('/api/availability/next-free-dates', methods=['GET'])
+    @jwt_required()
+    def get_next_free_dates_route():
+        try:
+            venue_id = request.args.get('venue_id', type=int)
+            package_id = request.args.get('package_id', type=int)
+            if (venue_id is None) == (package_id is None):
+                return jsonify({'message': 'Provide exactly one of venue_id or package_id'}), 400
+
+            try:
+                from_date = request.args.get('from')
+                from_date = datetime.strptime(from_date, '%Y-%m-%d').date() if from_date else date.today()
+                start_time = request.args.get('start_time')
+                end_time = request.args.get('end_time')
+                start_time = datetime.strptime(start_time, '%H:%M').time() if start_time else None
+                end_time = datetime.strptime(end_time, '%H:%M').time() if end_time else None
+            except ValueError:
+                return jsonify({'message': 'Invalid from, start_time or end_time. Expected YYYY-MM-DD and HH:MM'}), 400
+
+            if (start_time is None) != (end_time is None) or (start_time and start_time >= end_time):
+                return jsonify({'message': 'start_time and end_time must be given together, with start_time first'}), 400
+
+            limit = request.args.get('limit', 5, type=int)
+            horizon_days = request.args.get('horizon_days', 365, type=int)
+            if not 1 <= limit <= MAX_FREE_DATES or not 1 <= horizon_days <= MAX_FREE_DATE_HORIZON_DAYS:
+                return jsonify({
+                    'message': f'limit must be 1-{MAX_FREE_DATES} and horizon_days 1-{MAX_FREE_DATE_HORIZON_DAYS}'
+                }), 400
+
+            dates = get_next_free_dates(
+                venue_id=venue_id, package_id=package_id, from_date=from_date,
+                start_time=start_time, end_time=end_time,
+                limit=limit, horizon_days=horizon_days
+            )
+            if dates is None:
+                return jsonify({'message': 'Venue or package not found'}), 404
+
+            return jsonify({
+                'status': 'success',
+                'data': {
+                    'from': from_date,
+                    'horizon_days': horizon_days,
+                    'dates': dates
+                }
+            }), 200
+        except Exception as e:
+            app.logger.error(f"Error finding next free dates: {e}")
+            return jsonify({'message': 'An error occurred while searching for free dates'}), 500
+
     @app.route('/wishlist', methods=['GET'])
     @jwt_required()
     def get_wishlist():
-        email = get_jwt_identity()
-        userid = get_user_id_by_email(email)
-        print(f"User ID from email: {userid}")  # Debug statement
+        userid = current_user_id()
+        print(f"User ID from token: {userid}")  # Debug statement
+        if _wants_stream():
+            return _stream_json(iter_user_wishlist(userid))
         wishlist = get_user_wishlist(userid)
 
         return jsonify(wishlist), 200
@@ -169,12 +540,39 @@ def init_routes(app):
     @jwt_required(refresh=True)
     def refresh():
         current_user = get_jwt_identity()
-        new_access_token = create_access_token(identity=current_user)
+        claims = get_jwt()
+        new_access_token = create_access_token(
+            identity=current_user,
+            additional_claims={key: claims[key] for key in ('user_type', 'userid', 'supplier_id') if key in claims}
+        )
         return jsonify(access_token=new_access_token)
 
+    @app.route('/api/internal/metrics', methods=['GET'])
+    @jwt_required()
+    def get_internal_metrics():
+        """Process-local cache and auth counters, for admins only"""
+        if not current_user_is_admin():
+            return jsonify({'message': 'Admin access required'}), 403
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'pid': os.getpid(),
+                'identity_cache': identity_cache.stats(),
+                'password_hashing': hashing_stats(),
+                'rate_limits': rate_limit_stats(),
+                'token_revocation': revocation_store.stats(),
+                'image_stat_cache': stat_cache.stats(),
+                'catalog_responses': catalog_response_cache.stats(),
+                'bootstrap_snapshot': bootstrap_snapshot.stats()
+            }
+        }), 200
+
     @app.route('/logout', methods=['POST'])
+    @jwt_required()
     def logout():
-       
+        claims = get_jwt()
+        expires_at = datetime.fromtimestamp(claims['exp'], tz=timezone.utc) if 'exp' in claims else None
+        revocation_store.revoke(claims['jti'], claims.get('userid'), expires_at)
         return jsonify({'message': 'Logged out successfully'}), 200
 
     @app.route('/outfits', methods=['POST'])
@@ -196,6 +594,8 @@ def init_routes(app):
 
             # Create the new outfit
             if create_outfit(outfit_name, outfit_type, outfit_color, outfit_desc, rent_price, status, outfit_img):
+                # Sizes and placeholder for the image manifest, which never generates them itself
+                schedule_variants(OUTFIT_FOLDER, os.path.basename(outfit_img))
                 return jsonify({'message': 'Outfit added successfully!'}), 201
             else:
                 return jsonify({'message': 'Error adding outfit'}), 500
@@ -203,9 +603,19 @@ def init_routes(app):
             return jsonify({'message': f'Error: {str(e)}'}), 500
 
     @app.route('/outfits', methods=['GET'])
+    @catalog_cached
     def get_all_outfits():
         try:
-            outfits = get_outfits()
+            fields, error = _requested_fields(OUTFIT_FIELDS)
+            if error:
+                return error
+            columnar, error = _requested_columnar()
+            if error:
+                return error
+
+            if _wants_stream() and not columnar:
+                return _stream_json(iter_outfits(fields=fields))
+            outfits = get_outfits(fields=fields, columnar=columnar)
             return jsonify(outfits), 200
         except Exception as e:
             return jsonify({'message': f'Error fetching outfits: {str(e)}'}), 500
@@ -226,8 +636,7 @@ def init_routes(app):
     @jwt_required()
     def book_outfit_route():
         try:
-            email = get_jwt_identity()
-            userid = get_user_id_by_email(email)  # Assuming this function exists
+            userid = current_user_id()
 
             data = request.json
             outfit_id = data.get('outfit_id')
@@ -247,8 +656,7 @@ def init_routes(app):
     @jwt_required()
     def get_user_booked_wishlist():
         try:
-            email = get_jwt_identity()
-            userid = get_user_id_by_email(email)  # Assuming a function to get user ID by email exists
+            userid = current_user_id()
 
             # Fetch events for the user from the updated events table
             booked_wishlist = get_booked_wishlist_by_user(userid)
@@ -272,13 +680,12 @@ def init_routes(app):
     @jwt_required()
     def get_user_booked_outfits():
         try:
-            # Fetch the current user's email from the JWT token
-            email = get_jwt_identity()
-            
-            # Here, you would fetch the user's ID based on their email (you can create a helper function for this)
-            # Assuming you have a function to get the user ID from email
-            userid = get_user_id_by_email(email)
+            # Fetch the current user's ID from the JWT claims
+            userid = current_user_id()
             
+            if _wants_stream():
+                return _stream_json(iter_booked_outfits_by_user(userid))
+
             # Fetch the booked outfits for the user
             booked_outfits = get_booked_outfits_by_user(userid)
             
@@ -290,6 +697,7 @@ def init_routes(app):
 
     #packages routes
     @app.route('/created-packages', methods=['GET', 'OPTIONS'])
+    @catalog_cached
     def get_packages_route():
         """
         Route for fetching all event packages.
@@ -301,57 +709,24 @@ def init_routes(app):
             return jsonify({'message': 'OK'}), 200
             
         try:
-            # Get packages formatted for client use
-            packages = get_client_packages()
+            fields, error = _requested_fields(CREATED_PACKAGE_FIELDS)
+            if error:
+                return error
+
+            # Get packages formatted for client use, selecting only what the requested fields need
+            packages = get_client_packages(
+                fields=None if fields is None else {
+                    column for field in fields for column in CREATED_PACKAGE_FIELDS[field]
+                }
+            )
             
             # Format the results
             formatted_packages = []
             for package in packages:
-                # Process venue image path if venue exists
-                venue_image = None
-                if package.get('venue_id'):
-                    venue_image = package.get('venue_image')
-                    if venue_image:
-                        # Handle different path formats
-                        if '\\' in venue_image:
-                            venue_image = venue_image.split('\\')[-1]
-                        elif '/' in venue_image:
-                            venue_image = venue_image.split('/')[-1]
-                        
-                        # If the image is one of our static images, use direct static path
-                        static_images = ['grandballroom.png', 'hogwarts.png', 'oceanview.png', 'paseo.png', 'sealavie.png']
-                        if any(venue_image.endswith(img) for img in static_images):
-                            venue_image = f'/img/venues-img/{venue_image}'
-                        # For uploaded images, use API endpoint
-                        else:
-                            venue_image = f'/api/venue-image/{venue_image}'
-                
-                formatted_packages.append({
-                    'package_id': package['package_id'],
-                    'package_name': package['package_name'],
-                    'capacity': package['capacity'],
-                    'description': package['description'],
-                    'additional_capacity_charges': float(package['additional_capacity_charges']) if package['additional_capacity_charges'] else 0,
-                    'charge_unit': package['charge_unit'],
-                    'total_price': float(package['total_price']) if package['total_price'] else 0,
-                    'status': package['status'],
-                    'venue': {
-                        'name': package['venue_name'],
-                        'location': package.get('location'),
-                        'price': float(package.get('venue_price', 0)),
-                        'capacity': package.get('venue_capacity'),
-                        'description': package.get('venue_description'),
-                        'image': venue_image
-                    } if package.get('venue_name') else None,
-                    'event_type': package.get('event_type_name'),
-                    'gown_package': {
-                        'name': package.get('gown_package_name'),
-                        'price': float(package.get('gown_package_price', 0)),
-                        'description': package.get('gown_package_description')
-                    } if package.get('gown_package_name') else None,
-                    'suppliers': package.get('suppliers', []),
-                    'additional_services': package.get('additional_services', [])
-                })
+                formatted_package = _format_created_package(package)
+                if fields is not None:
+                    formatted_package = {key: value for key, value in formatted_package.items() if key in fields}
+                formatted_packages.append(formatted_package)
             
             return jsonify(formatted_packages), 200
         except Exception as e:
@@ -364,7 +739,62 @@ def init_routes(app):
                 'error': str(e)
             }), 500
 
+    @app.route('/api/batch', methods=['POST'])
+    @jwt_required()
+    def batch_route():
+        """
+        Run several catalog GETs in one request: {"requests": ["/event-types", "/available-venues?fields=venue_id"]}.
+        The token is verified once for all of them. Each entry of "responses" carries the
+        status code and body its request would have returned on its own.
+        """
+        data = request.get_json(silent=True)
+        paths = data.get('requests') if isinstance(data, dict) else None
+        if not isinstance(paths, list) or not paths or len(paths) > MAX_BATCH_REQUESTS:
+            return jsonify({
+                'status': 'error',
+                'message': f"requests must list between 1 and {MAX_BATCH_REQUESTS} paths"
+            }), 400
+
+        rejected = [path for path in paths if resolve_batch_path(path) is None]
+        if rejected:
+            allowed = ', '.join(sorted(str(rule) for rule in app.url_map.iter_rules() if rule.endpoint in BATCH_ENDPOINTS))
+            return jsonify({
+                'status': 'error',
+                'message': f"Cannot batch: {', '.join(map(str, rejected))}. Allowed: {allowed}"
+            }), 400
+
+        try:
+            results = run_batch(paths)
+        except Exception as e:
+            app.logger.error(f"Error running batch: {e}")
+            return jsonify({
+                'status': 'error',
+                'message': 'An error occurred while running the batch'
+            }), 500
+
+        # Bodies are already JSON; splice them in instead of decoding and encoding them again
+        entries = b','.join(
+            b'{"path":' + json_bytes(result.path) + b',"status":' + str(result.status).encode() + b',"body":' + result.body + b'}'
+            for result in results
+        )
+        return app.response_class(b'{"status":"success","responses":[' + entries + b']}', mimetype='application/json')
+
+    @app.route('/api/bootstrap', methods=['GET'])
+    @jwt_required()
+    def get_bootstrap():
+        """Event types, venues, gown packages, services, suppliers and packages in one prebuilt response"""
+        try:
+            payload = bootstrap_snapshot.payload()
+        except Exception as e:
+            app.logger.error(f"Error building bootstrap snapshot: {e}")
+            return jsonify({
+                'status': 'error',
+                'message': 'An error occurred while loading the catalog'
+            }), 500
+        return payload.response()
+
     @app.route('/event-types', methods=['GET'])
+    @catalog_cached
     def get_event_types_route():
         try:
             event_types = get_event_types()
@@ -376,6 +806,7 @@ def init_routes(app):
     #additional services routes
     @app.route('/created-services', methods=['GET'])
     @jwt_required()
+    @catalog_cached
     def get_services_route():
         try:
             services = get_all_additional_services()
@@ -388,7 +819,11 @@ def init_routes(app):
     @jwt_required()
     def get_booked_schedules_route():
         try:
-            schedules = get_booked_schedules()
+            columnar, error = _requested_columnar()
+            if error:
+                return error
+
+            schedules = get_booked_schedules(columnar=columnar)
             return jsonify(schedules)
         except Exception as e:
             app.logger.error(f"Error in get_booked_schedules route: {str(e)}")
@@ -399,8 +834,7 @@ def init_routes(app):
     def create_event():
         try:
             # Get user ID from JWT token
-            email = get_jwt_identity()
-            userid = get_user_id_by_email(email)
+            userid = current_user_id()
             
             if not userid:
                 return jsonify({
@@ -496,8 +930,7 @@ def init_routes(app):
     @jwt_required()
     def create_wishlist_package_route():
         try:
-            email = get_jwt_identity()
-            userid = get_user_id_by_email(email)
+            userid = current_user_id()
             
             if userid is None:
                 return jsonify({
@@ -566,9 +999,17 @@ def init_routes(app):
 
 
     @app.route('/api/suppliers', methods=['GET'])
+    @catalog_cached
     def get_suppliers():
         try:
-            suppliers = get_available_suppliers()
+            fields, error = _requested_fields(SUPPLIER_FIELDS)
+            if error:
+                return error
+            columnar, error = _requested_columnar()
+            if error:
+                return error
+
+            suppliers = get_available_suppliers(fields=fields, columnar=columnar)
             logging.info(f"Suppliers data: {suppliers}")
             return jsonify({
                 'status': 'success',
@@ -611,8 +1052,8 @@ def init_routes(app):
             email = get_jwt_identity()
             logging.info(f"Fetching profile for user email: {email}")
             
-            # Get user ID from email
-            userid = get_user_id_by_email(email)
+            # Get user ID from the token claims
+            userid = current_user_id()
             if not userid:
                 logging.warning(f"No user found for email: {email}")
                 return jsonify({
@@ -666,8 +1107,7 @@ def init_routes(app):
                 }), 400
 
             # Get user ID from the JWT token
-            email = get_jwt_identity()
-            user_id = get_user_id_by_email(email)
+            user_id = current_user_id()
 
             if not user_id:
                 return jsonify({
@@ -689,6 +1129,8 @@ def init_routes(app):
                     'message': message
                 }), 400
 
+        except PasswordHasherBusy:
+            return _hasher_busy_response()
         except Exception as e:
             print(f"Error in change_password_route: {e}")
             return jsonify({
@@ -791,20 +1233,106 @@ def init_routes(app):
             }), 500
 
 
+    def _send_image(folder, filename, fallback=None):
+        """
+        Send an image from storage, or fallback if it does not exist, with validators and
+        caching headers. ?w= selects the closest pre-generated resized variant. Content-addressed
+        names and ?v= URLs are cached as immutable; a conditional request that still matches gets
+        a 304. With object storage the client is redirected to a presigned URL instead.
+        """
+        image = stat_image(folder, filename)
+        placeholder = image is None
+        if placeholder and fallback:
+            image = stat_image(folder, fallback)
+        if image is None:
+            raise NotFound()
+
+        if not storage.is_local:
+            response = redirect(storage.presigned_url(image))
+            # Reuse the redirect while its presigned URL is still valid
+            response.cache_control.private = True
+            response.cache_control.max_age = 0 if placeholder else storage.url_expires // 2
+            return response
+
+        width = request.args.get('w', type=int)
+        variant_pending = False
+        if width and width > 0:
+            image, variant_pending = resolve_variant(folder, image, width, request.accept_mimetypes['image/webp'] > 0)
+
+        etag = image_etag(image)
+        last_modified = datetime.fromtimestamp(int(image.mtime), tz=timezone.utc)
+        offload = offload_headers(image)
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.last_modified = last_modified
+        elif offload:
+            # The proxy streams the file (and handles ranges) and sets Content-Length from it;
+            # the worker only resolved it. Unintercepted, this is an empty body, not a hang
+            response = app.response_class(mimetype=image_mimetype(image), headers=offload)
+            response.set_etag(etag)
+            response.last_modified = last_modified
+        else:
+            # gunicorn's wsgi.file_wrapper sends the file with os.sendfile
+            response = send_file(image.path, etag=etag, last_modified=last_modified, conditional=True)
+
+        if placeholder or variant_pending:
+            # A placeholder must not outlive the upload that replaces it, nor the full-size
+            # original the variant that replaces it under this URL
+            response.cache_control.no_cache = True
+        elif is_immutable_name(filename) or 'v' in request.args:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMAGE_MAX_AGE
+        if width:
+            response.vary.add('Accept')
+        return response
+
+    @app.route('/api/images/manifest', methods=['GET'])
+    @jwt_required()
+    def get_image_manifest():
+        """Pixel sizes, byte sizes, variants and placeholders for ?type=&names=a.png,b.png"""
+        folder = IMAGE_MANIFEST_FOLDERS.get(request.args.get('type'))
+        if folder is None:
+            return jsonify({
+                'status': 'error',
+                'message': f"type must be one of: {', '.join(IMAGE_MANIFEST_FOLDERS)}"
+            }), 400
+
+        names = [name for name in request.args.get('names', '').split(',') if name]
+        if not names or len(names) > MAX_MANIFEST_IMAGES:
+            return jsonify({
+                'status': 'error',
+                'message': f"names must list between 1 and {MAX_MANIFEST_IMAGES} images"
+            }), 400
+
+        try:
+            response = jsonify({
+                'status': 'success',
+                'data': image_manifest(folder, names)
+            })
+            # Short-lived: entries fill in once their variants have been generated elsewhere.
+            # Private, as the response is only given to authenticated users
+            response.cache_control.private = True
+            response.cache_control.max_age = 60
+            return response, 200
+        except Exception as e:
+            app.logger.error(f"Error building image manifest: {e}")
+            return jsonify({
+                'status': 'error',
+                'message': 'An error occurred while building the image manifest'
+            }), 500
+
     @app.route('/api/outfits-packages-bg/<path:filename>')
     def serve_outfit_package_background(filename):
         try:
-            # Get the absolute path to the project root directory
-            root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-            bg_img_dir = os.path.join(root_dir, 'saved', 'outfits_packages_bg')
-            
-            # Check if the requested file exists
-            requested_file_path = os.path.join(bg_img_dir, filename)
-            if os.path.exists(requested_file_path):
-                return send_from_directory(bg_img_dir, filename)
-            else:
-                # Return the first available background as fallback
-                return send_from_directory(bg_img_dir, 'bg1.png')
+            # Fall back to the first available background if the requested file does not exist
+            return _send_image(OUTFIT_PACKAGE_BG_FOLDER, filename, 'bg1.png')
                 
         except Exception as e:
             print(f"Error serving outfit package background image {filename}: {e}")
@@ -813,17 +1341,8 @@ def init_routes(app):
     @app.route('/api/outfits/image/<path:filename>')
     def serve_outfit_image(filename):
         try:
-            # Get the absolute path to the project root directory
-            root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-            outfit_img_dir = os.path.join(root_dir, 'saved', 'outfits_img')
-            
-            # Check if the requested file exists
-            requested_file_path = os.path.join(outfit_img_dir, filename)
-            if os.path.exists(requested_file_path):
-                return send_from_directory(outfit_img_dir, filename)
-            else:
-                # Return default image
-                return send_from_directory(outfit_img_dir, 'default_outfit.png')
+            # Fall back to the default image if the requested file does not exist
+            return _send_image(OUTFIT_FOLDER, filename, 'default_outfit.png')
                 
         except Exception as e:
             print(f"Error serving outfit image {filename}: {e}")
@@ -833,22 +1352,13 @@ def init_routes(app):
     def serve_profile_image(filename):
         """Serve profile images from the users_profile directory"""
         try:
-            # Get the absolute path to the project root directory
-            root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-            profile_img_dir = os.path.join(root_dir, 'saved', 'users_profile')
-            
-            # Check if the requested file exists
-            image_path = os.path.join(profile_img_dir, filename)
-            if os.path.exists(image_path):
-                return send_from_directory(profile_img_dir, filename)
-            
             # If file doesn't exist, return the dummy profile pic
-            return send_from_directory(profile_img_dir, 'dummy_profile.png')
+            return _send_image(PROFILE_FOLDER, filename, 'dummy_profile.png')
         except Exception as e:
-            logger.error(f"Error serving profile image: {e}")
+            app.logger.error(f"Error serving profile image: {e}")
             try:
                 # As a last resort, try to serve the dummy profile
-                return send_from_directory(profile_img_dir, 'dummy_profile.png')
+                return _send_image(PROFILE_FOLDER, 'dummy_profile.png')
             except:
                 return jsonify({
                     'status': 'error',
@@ -858,17 +1368,8 @@ def init_routes(app):
     @app.route('/saved/venue_img/<path:filename>')
     def serve_venue_image(filename):
         try:
-            # Get the absolute path to the project root directory
-            root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-            venue_img_dir = os.path.join(root_dir, 'saved', 'venue_img')
-            
-            # Check if the requested file exists
-            requested_file_path = os.path.join(venue_img_dir, filename)
-            if os.path.exists(requested_file_path):
-                return send_from_directory(venue_img_dir, filename)
-            else:
-                # Return default venue image
-                return send_from_directory(venue_img_dir, 'grandballroom.png')
+            # Fall back to the default venue image if the requested file does not exist
+            return _send_image(VENUE_FOLDER, filename, 'grandballroom.png')
         except Exception as e:
             app.logger.error(f"Error serving venue image {filename}: {e}")
             return jsonify({'message': 'Image not found'}), 404
@@ -882,17 +1383,7 @@ def init_routes(app):
             print(f"DEBUG: JWT token contains email: {email}")
             
             # First check if the user is a supplier
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT u.userid, s.supplier_id, s.service
-                FROM users u
-                JOIN suppliers s ON u.userid = s.userid
-                WHERE u.email = %s
-            """, (email,))
-            supplier_info = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            supplier_info = current_supplier_id()
             
             if not supplier_info:
                 print(f"DEBUG: User {email} is not a supplier")
@@ -902,6 +1393,12 @@ def init_routes(app):
                 }), 403
                 
             print(f"DEBUG: Found supplier info: {supplier_info}")
+
+            if _wants_stream():
+                return _stream_json(
+                    iter_supplier_booked_events(supplier_info),
+                    prefix=b'{"status":"success","data":[', suffix=b']}'
+                )
             
             # Get the supplier's booked events directly using email
             events = get_supplier_booked_events(email)
@@ -961,9 +1458,8 @@ def init_routes(app):
                     'message': 'No file selected'
                 }), 400
 
-            # Get current user's email from JWT
-            email = get_jwt_identity()
-            user_id = get_user_id_by_email(email)
+            # Get current user's ID from JWT
+            user_id = current_user_id()
             
             if not user_id:
                 return jsonify({
@@ -971,30 +1467,17 @@ def init_routes(app):
                     'message': 'User not found'
                 }), 404
 
-            # Check if file type is allowed
-            allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-            if not '.' in file.filename or \
-               file.filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
+            # The upload was streamed to a temp file while its type was sniffed, see uploads.py
+            upload = file.stream
+            if not isinstance(upload, ProfileImageUpload) or upload.rejected:
                 return jsonify({
                     'status': 'error',
                     'message': 'Invalid file type'
                 }), 400
 
-            # Create a secure filename with timestamp and UUID
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            file_extension = file.filename.rsplit('.', 1)[1].lower()
-            filename = f"profile_{user_id}_{timestamp}_{str(uuid.uuid4())[:8]}.{file_extension}"
-            
-            # Get the absolute path to the project root directory
-            root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-            profile_img_dir = os.path.join(root_dir, 'saved', 'users_profile')
-            
-            # Ensure the directory exists
-            os.makedirs(profile_img_dir, exist_ok=True)
-            
-            # Save file to the specified directory
-            save_path = os.path.join(profile_img_dir, filename)
-            file.save(save_path)
+            # Store the file under the hash of its content; identical images share one file
+            filename = upload.save()
+            schedule_variants(PROFILE_FOLDER, filename)
 
             # Update user's profile picture in database
             if update_user_profile_picture(user_id, filename):
@@ -1006,16 +1489,17 @@ def init_routes(app):
                     }
                 }), 200
             else:
-                # If database update fails, delete the uploaded file
-                if os.path.exists(save_path):
-                    os.remove(save_path)
+                # If database update fails, delete the uploaded file unless another user shares it.
+                # Keep the grace window: a concurrent upload of the same bytes may not be referenced yet
+                if count_profile_image_references(filename) == 0:
+                    remove_profile_image(filename)
                 return jsonify({
                     'status': 'error',
                     'message': 'Failed to update profile picture in database'
                 }), 500
 
         except Exception as e:
-            logger.error(f"Error updating profile picture: {e}")
+            app.logger.error(f"Error updating profile picture: {e}")
             return jsonify({
                 'status': 'error',
                 'message': str(e)
@@ -1025,9 +1509,8 @@ def init_routes(app):
     @jwt_required()
     def submit_event_feedback():
         try:
-            # Get current user's email and ID
-            email = get_jwt_identity()
-            userid = get_user_id_by_email(email)
+            # Get current user's ID
+            userid = current_user_id()
             
             if not userid:
                 return jsonify({
@@ -1096,9 +1579,8 @@ def init_routes(app):
     @jwt_required()
     def update_user_profile_route():
         try:
-            # Get the current user's email from JWT token
-            email = get_jwt_identity()
-            userid = get_user_id_by_email(email)
+            # Get the current user's ID from JWT token
+            userid = current_user_id()
             
             if not userid:
                 return jsonify({
@@ -1252,6 +1734,45 @@ def init_routes(app):
             }), 500
     
     # Supplier Availability Endpoints
+    def _parse_availability_batch(data):
+        """
+        Validate the batch fields of an availability request.
+        :return: Tuple (start_date, end_date, dates, weekdays)
+        :raises ValueError: if the dates, range or weekday mask are invalid
+        """
+        def parse_date(value):
+            try:
+                return datetime.strptime(value, '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid date: {value}. Expected YYYY-MM-DD')
+
+        start_date = end_date = dates = None
+        if data.get('dates'):
+            if not isinstance(data['dates'], list):
+                raise ValueError('dates must be a list')
+            dates = sorted({parse_date(value) for value in data['dates']})
+            if len(dates) > MAX_AVAILABILITY_BATCH_DAYS:
+                raise ValueError(f'At most {MAX_AVAILABILITY_BATCH_DAYS} dates can be set at once')
+        else:
+            if not data.get('start_date') or not data.get('end_date'):
+                raise ValueError('Both start_date and end_date are required for a date range')
+            start_date = parse_date(data['start_date'])
+            end_date = parse_date(data['end_date'])
+            if end_date < start_date:
+                raise ValueError('end_date must not be before start_date')
+            if (end_date - start_date).days + 1 > MAX_AVAILABILITY_BATCH_DAYS:
+                raise ValueError(f'A date range can span at most {MAX_AVAILABILITY_BATCH_DAYS} days')
+
+        # Weekdays follow JavaScript's Date.getDay(): 0 = Sunday ... 6 = Saturday
+        weekdays = data.get('weekdays')
+        if weekdays is not None:
+            if not isinstance(weekdays, list) or not all(
+                    isinstance(day, int) and 0 <= day <= 6 for day in weekdays):
+                raise ValueError('weekdays must be a list of integers from 0 (Sunday) to 6 (Saturday)')
+            weekdays = sorted(set(weekdays)) or None
+
+        return start_date, end_date, dates, weekdays
+
     @app.route('/api/supplier/availability', methods=['GET'])
     @jwt_required()
     def get_supplier_availability_route():
@@ -1259,7 +1780,7 @@ def init_routes(app):
             email = get_jwt_identity()
             print(f"DEBUG: JWT identity (email): {email}")
             
-            supplier_id = get_supplier_id_by_email(email)
+            supplier_id = current_supplier_id()
             print(f"DEBUG: Supplier ID: {supplier_id}")
             
             if not supplier_id:
@@ -1274,6 +1795,32 @@ def init_routes(app):
             end_date = request.args.get('end_date')
             print(f"DEBUG: Date range - start: {start_date}, end: {end_date}")
             
+            # Compact formats: run-length encoded ranges or a year bitmap
+            response_format = request.args.get('format', 'rows')
+            if response_format == 'runs':
+                return jsonify({
+                    'status': 'success',
+                    'format': 'runs',
+                    'data': get_supplier_availability_runs(supplier_id, start_date, end_date)
+                }), 200
+            if response_format == 'bitmap':
+                year = request.args.get('year', type=int) or datetime.now().year
+                if not 1 <= year <= 9999:
+                    return jsonify({
+                        'status': 'error',
+                        'message': 'Invalid year'
+                    }), 400
+                return jsonify({
+                    'status': 'success',
+                    'format': 'bitmap',
+                    'data': get_supplier_availability_bitmap(supplier_id, year)
+                }), 200
+            if response_format != 'rows':
+                return jsonify({
+                    'status': 'error',
+                    'message': 'format must be one of: rows, runs, bitmap'
+                }), 400
+
             availability = get_supplier_availability(supplier_id, start_date, end_date)
             print(f"DEBUG: Availability data: {availability}")
             
@@ -1294,8 +1841,7 @@ def init_routes(app):
     @jwt_required()
     def set_supplier_availability_route():
         try:
-            email = get_jwt_identity()
-            supplier_id = get_supplier_id_by_email(email)
+            supplier_id = current_supplier_id()
             
             if not supplier_id:
                 return jsonify({
@@ -1308,6 +1854,28 @@ def init_routes(app):
             is_available = data.get('is_available', True)
             reason = data.get('reason')
             
+            # Batch form: a date range or a list of dates, optionally masked by weekday
+            if data.get('dates') or data.get('start_date') or data.get('end_date'):
+                try:
+                    start_date, end_date, dates, weekdays = _parse_availability_batch(data)
+                except ValueError as e:
+                    return jsonify({
+                        'status': 'error',
+                        'message': str(e)
+                    }), 400
+
+                rows_written = set_supplier_availability_bulk(
+                    supplier_id, is_available, reason,
+                    start_date=start_date, end_date=end_date,
+                    dates=dates, weekdays=weekdays
+                )
+
+                return jsonify({
+                    'status': 'success',
+                    'message': 'Availability updated successfully',
+                    'rows_written': rows_written
+                }), 200
+
             if not date:
                 return jsonify({
                     'status': 'error',
@@ -1318,7 +1886,8 @@ def init_routes(app):
             
             return jsonify({
                 'status': 'success',
-                'message': 'Availability updated successfully'
+                'message': 'Availability updated successfully',
+                'rows_written': 1
             }), 200
             
         except Exception as e:
@@ -1332,8 +1901,7 @@ def init_routes(app):
     @jwt_required()
     def delete_supplier_availability_route(date):
         try:
-            email = get_jwt_identity()
-            supplier_id = get_supplier_id_by_email(email)
+            supplier_id = current_supplier_id()
             
             if not supplier_id:
                 return jsonify({
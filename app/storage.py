@@ -0,0 +1,164 @@
+# storage.py
+import logging
+import mimetypes
+import os
+import stat
+import tempfile
+from collections import namedtuple
+
+from werkzeug.security import safe_join
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # only needed with IMAGE_STORAGE=s3
+    boto3 = None
+    ClientError = None
+
+logger = logging.getLogger(__name__)
+
+# Image folders, relative to the storage root (local) or bucket prefix (S3)
+PROFILE_FOLDER = 'users_profile'
+OUTFIT_FOLDER = 'outfits_img'
+VENUE_FOLDER = 'venue_img'
+OUTFIT_PACKAGE_BG_FOLDER = 'outfits_packages_bg'
+
+# Local images live in 'saved' next to the project directory unless IMAGE_STORAGE_ROOT is set
+DEFAULT_LOCAL_ROOT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 'saved'
+)
+
+# path is a filesystem path for LocalStorage and an object key for S3Storage
+StoredFile = namedtuple('StoredFile', ['path', 'size', 'mtime'])
+
+
+class LocalStorage:
+    """Images on the local disk, stored as <root>/<folder>/<name>."""
+
+    is_local = True
+
+    def __init__(self, root):
+        self.root = root
+
+    def folder_path(self, folder):
+        return os.path.join(self.root, folder)
+
+    def stat(self, folder, name):
+        """:return: StoredFile, or None if there is no such regular file"""
+        path = safe_join(self.folder_path(folder), name)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return StoredFile(path, st.st_size, st.st_mtime)
+
+    def temp_dir(self, folder):
+        """Directory for upload temp files, on the same filesystem so put_file can rename them."""
+        path = self.folder_path(folder)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def put_file(self, folder, name, temp_path):
+        """Move a finished temp file into place. An existing file of the same name is kept."""
+        final_path = os.path.join(self.temp_dir(folder), name)
+        if os.path.exists(final_path):
+            # Already stored; refresh the mtime so a concurrent GC leaves it alone
+            os.utime(final_path)
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, final_path)
+
+    def delete(self, folder, name):
+        try:
+            os.remove(os.path.join(self.folder_path(folder), name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def presigned_url(self, stored):
+        return None
+
+
+class S3Storage:
+    """
+    Images in an S3-compatible bucket (AWS S3, MinIO, ...), stored as [<prefix>/]<folder>/<name>.
+    Clients are redirected to presigned URLs, so image bytes never pass through the app.
+    Credentials come from the usual AWS_* environment variables.
+    """
+
+    is_local = False
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, url_expires=3600):
+        if boto3 is None:
+            raise RuntimeError("IMAGE_STORAGE=s3 requires the boto3 package")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.url_expires = url_expires
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+
+    def key(self, folder, name):
+        key = safe_join(folder, name)
+        if key is None:
+            return None
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def stat(self, folder, name):
+        """:return: StoredFile keyed by the object key, or None if there is no such object"""
+        key = self.key(folder, name)
+        if key is None:
+            return None
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return StoredFile(key, head['ContentLength'], head['LastModified'].timestamp())
+
+    def temp_dir(self, folder):
+        return tempfile.gettempdir()
+
+    def put_file(self, folder, name, temp_path):
+        """Upload a finished temp file and remove it. An existing object of the same name is kept."""
+        key = self.key(folder, name)
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        try:
+            if self.stat(folder, name) is not None:
+                # Already stored; copy it onto itself to refresh LastModified for the GC grace period
+                self.client.copy_object(
+                    Bucket=self.bucket, Key=key, CopySource={'Bucket': self.bucket, 'Key': key},
+                    ContentType=content_type, MetadataDirective='REPLACE'
+                )
+            else:
+                self.client.upload_file(temp_path, self.bucket, key, ExtraArgs={'ContentType': content_type})
+        finally:
+            os.remove(temp_path)
+
+    def delete(self, folder, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(folder, name))
+        return True
+
+    def presigned_url(self, stored):
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': stored.path}, ExpiresIn=self.url_expires
+        )
+
+
+def create_storage():
+    """Build the image storage selected by IMAGE_STORAGE ('local' or 's3')."""
+    if os.getenv('IMAGE_STORAGE', 'local').lower() == 's3':
+        return S3Storage(
+            bucket=os.environ['IMAGE_S3_BUCKET'],
+            prefix=os.getenv('IMAGE_S3_PREFIX', ''),
+            endpoint_url=os.getenv('IMAGE_S3_ENDPOINT_URL'),
+            region=os.getenv('IMAGE_S3_REGION'),
+            url_expires=int(os.getenv('IMAGE_S3_URL_EXPIRES', 3600))
+        )
+    return LocalStorage(os.getenv('IMAGE_STORAGE_ROOT', DEFAULT_LOCAL_ROOT))
+
+
+storage = create_storage()
@@ -0,0 +1,119 @@
+# uploads.py
+import hashlib
+import os
+import tempfile
+
+from flask import Request
+
+from .images import commit_profile_image
+from .storage import storage, PROFILE_FOLDER
+
+# Enough leading bytes to tell every accepted image type apart (WebP needs 12)
+SNIFF_BYTES = 12
+
+# Endpoints whose file uploads are streamed straight to disk instead of being spooled
+STREAMED_UPLOAD_ENDPOINTS = {'update_profile_picture'}
+
+
+def sniff_image_type(head):
+    """
+    Identify an image from its magic bytes.
+    :param head: The first SNIFF_BYTES bytes of the file (or all of it, if shorter)
+    :return: File extension (png, jpg, gif, webp), or None if it is not an accepted image
+    """
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class ProfileImageUpload:
+    """
+    Write-only file object that Werkzeug's form parser streams a profile picture into.
+    The type is sniffed from the first bytes; if it is not an accepted image the rest
+    of the part is discarded as it arrives. Accepted bytes are hashed while being
+    written to a temp file, so nothing beyond the parser's read buffer is held in memory.
+    """
+
+    def __init__(self):
+        self.image_type = None
+        self.rejected = False
+        self.size = 0
+        self._head = b''
+        self._digest = hashlib.sha256()
+        self._file = None
+        self._temp_path = None
+
+    def write(self, data):
+        if self.rejected:
+            return len(data)
+        if self._file is None:
+            self._head += data
+            if len(self._head) < SNIFF_BYTES:
+                return len(data)
+            self._start()
+            if self.rejected:
+                return len(data)
+        else:
+            self._append(data)
+        return len(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # The parser rewinds the container once the part is complete; a file shorter
+        # than SNIFF_BYTES is only typed at that point
+        if self._file is None and not self.rejected:
+            self._start()
+        return 0
+
+    def save(self):
+        """
+        Store the upload under the hash of its content.
+        :return: Stored filename, or None if the upload was not an accepted image
+        """
+        if self.rejected or self._file is None:
+            return None
+        self._file.close()
+        filename = commit_profile_image(self._temp_path, self._digest.hexdigest(), self.image_type)
+        self._file = None
+        self._temp_path = None
+        self.rejected = True  # nothing more to write or clean up
+        return filename
+
+    def close(self):
+        """Drop the temp file of an upload that was not saved."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._temp_path is not None:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+            self._temp_path = None
+
+    def _start(self):
+        head, self._head = self._head, b''
+        self.image_type = sniff_image_type(head)
+        if self.image_type is None:
+            self.rejected = True
+            return
+        fd, self._temp_path = tempfile.mkstemp(dir=storage.temp_dir(PROFILE_FOLDER), prefix='.upload-')
+        self._file = os.fdopen(fd, 'wb')
+        self._append(head)
+
+    def _append(self, data):
+        self._digest.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+
+class StreamingUploadRequest(Request):
+    """Request class that streams file parts for STREAMED_UPLOAD_ENDPOINTS into ProfileImageUpload."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint in STREAMED_UPLOAD_ENDPOINTS:
+            return ProfileImageUpload()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
@@ -0,0 +1,14 @@
+# backfill_image_variants.py
+# One-off: generate the variants and sidecars (size, placeholder, colour) of images stored
+# before they were generated on upload, so the image manifest can describe them.
+# Usage: python backfill_image_variants.py [folder ...]   (defaults to every image folder)
+import sys
+
+from app.images import backfill_variants
+from app.storage import PROFILE_FOLDER, OUTFIT_FOLDER, VENUE_FOLDER, OUTFIT_PACKAGE_BG_FOLDER
+
+if __name__ == '__main__':
+    folders = sys.argv[1:] or [OUTFIT_FOLDER, VENUE_FOLDER, OUTFIT_PACKAGE_BG_FOLDER, PROFILE_FOLDER]
+    for folder in folders:
+        generated, failed = backfill_variants(folder)
+        print(f"{folder}: generated {generated}, failed {failed}")
@@ -0,0 +1,65 @@
+"""Catalog version counter bumped by triggers on catalog tables.
+
+Revision ID: 3b6e0d9a7c52
+Revises: 7e2a9f5c1d08
+Create Date: 2026-10-19 18:02:41.118305
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3b6e0d9a7c52'
+down_revision = '7e2a9f5c1d08'
+branch_labels = None
+depends_on = None
+
+# Tables whose contents make up the public catalog (packages, venues, outfits, suppliers, ...)
+CATALOG_TABLES = (
+    'event_packages', 'event_package_services', 'event_package_additional_services', 'package_service',
+    'additional_services', 'event_type', 'venues', 'gown_package', 'gown_package_outfits', 'outfits',
+    'suppliers', 'supplier_social_media'
+)
+
+
+def upgrade():
+    # A single row; the CHECK keeps it that way
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL DEFAULT 1
+        )
+    """)
+    op.execute("INSERT INTO catalog_version (id, version) VALUES (TRUE, 1) ON CONFLICT (id) DO NOTHING")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE catalog_version SET version = version + 1;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+
+    # Statement-level, so a bulk change bumps the version once
+    for table in CATALOG_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_catalog_version ON {table}")
+        op.execute(f"""
+            CREATE TRIGGER trg_{table}_catalog_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+        """)
+    # Supplier listings show these user columns; logins and other user updates do not bump the version
+    op.execute("DROP TRIGGER IF EXISTS trg_users_catalog_version ON users")
+    op.execute("""
+        CREATE TRIGGER trg_users_catalog_version
+        AFTER UPDATE OF firstname, lastname, email, contactnumber, address, user_img OR DELETE ON users
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_users_catalog_version ON users")
+    for table in CATALOG_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_catalog_version ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS bump_catalog_version()")
+    op.execute("DROP TABLE IF EXISTS catalog_version")
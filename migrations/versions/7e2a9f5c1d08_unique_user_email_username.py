@@ -0,0 +1,75 @@
+"""Unique email and username for single-statement registration.
+
+Revision ID: 7e2a9f5c1d08
+Revises: d4f81a0c2b93
+Create Date: 2026-10-19 13:05:27.901442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2a9f5c1d08'
+down_revision = 'd4f81a0c2b93'
+branch_labels = None
+depends_on = None
+
+# Duplicate values listed when the migration refuses to run
+MAX_REPORTED_DUPLICATES = 50
+
+
+def upgrade():
+    # create_user relies on ON CONFLICT DO NOTHING firing for either column.
+    # Skip a column that already has a single-column unique index or constraint.
+    for column in ('email', 'username'):
+        _check_no_duplicates(column)
+        op.execute(f"""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1
+                    FROM pg_index i
+                    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+                    WHERE i.indrelid = 'users'::regclass
+                    AND i.indisunique
+                    AND i.indnatts = 1
+                    AND a.attname = '{column}'
+                ) THEN
+                    CREATE UNIQUE INDEX ux_users_{column} ON users ({column});
+                END IF;
+            END
+            $$
+        """)
+
+
+def _check_no_duplicates(column):
+    """
+    Uniqueness was never enforced before, so existing rows may share a value and
+    CREATE UNIQUE INDEX would abort with a bare constraint error. Report them instead.
+    To resolve, rename or merge the users listed (for example append the userid to
+    all but the oldest username: UPDATE users SET username = username || '_' || userid
+    WHERE userid IN (...)) and run the migration again.
+    """
+    duplicates = op.get_bind().execute(sa.text(f"""
+        SELECT {column}, array_agg(userid ORDER BY userid)
+        FROM users
+        WHERE {column} IS NOT NULL
+        GROUP BY {column}
+        HAVING COUNT(*) > 1
+        ORDER BY {column}
+        LIMIT {MAX_REPORTED_DUPLICATES + 1}
+    """)).fetchall()
+    if not duplicates:
+        return
+    listed = '\n'.join(f"  {value!r}: userids {list(userids)}" for value, userids in duplicates[:MAX_REPORTED_DUPLICATES])
+    more = '\n  ...' if len(duplicates) > MAX_REPORTED_DUPLICATES else ''
+    raise RuntimeError(
+        f"Cannot make users.{column} unique, these values are shared by several users:\n{listed}{more}\n"
+        f"Rename or merge them and run the migration again."
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ux_users_username")
+    op.execute("DROP INDEX IF EXISTS ux_users_email")
@@ -0,0 +1,34 @@
+"""Indexes for date-based supplier availability search.
+
+Revision ID: 9c1d2e7b4a61
+Revises: 475072fcbe43
+Create Date: 2026-10-19 09:12:41.118203
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9c1d2e7b4a61'
+down_revision = '475072fcbe43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Anti-joins in get_available_suppliers probe these by (date, supplier)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_supplier_availability_date_supplier "
+               "ON supplier_availability (date, supplier_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_wishlist_suppliers_supplier_wishlist "
+               "ON wishlist_suppliers (supplier_id, wishlist_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_wishlist_packages_events_id "
+               "ON wishlist_packages (events_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_events_schedule "
+               "ON events (schedule)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_events_schedule")
+    op.execute("DROP INDEX IF EXISTS ix_wishlist_packages_events_id")
+    op.execute("DROP INDEX IF EXISTS ix_wishlist_suppliers_supplier_wishlist")
+    op.execute("DROP INDEX IF EXISTS ix_supplier_availability_date_supplier")
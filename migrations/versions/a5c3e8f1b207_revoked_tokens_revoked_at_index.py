@@ -0,0 +1,24 @@
+"""Index revoked_tokens by revoked_at for incremental refreshes.
+
+Revision ID: a5c3e8f1b207
+Revises: 3b6e0d9a7c52
+Create Date: 2026-10-20 09:12:07.431562
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5c3e8f1b207'
+down_revision = '3b6e0d9a7c52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Workers re-read a window of recent revocations by revoked_at on every refresh
+    op.execute("CREATE INDEX IF NOT EXISTS ix_revoked_tokens_revoked_at ON revoked_tokens (revoked_at)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_revoked_tokens_revoked_at")
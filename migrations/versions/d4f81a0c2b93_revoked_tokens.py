@@ -0,0 +1,32 @@
+"""Revoked JWTs for /logout.
+
+Revision ID: d4f81a0c2b93
+Revises: 9c1d2e7b4a61
+Create Date: 2026-10-19 11:40:03.524117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f81a0c2b93'
+down_revision = '9c1d2e7b4a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # revocation_id is monotonic so workers can pull new rows incrementally
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            revocation_id BIGSERIAL PRIMARY KEY,
+            jti VARCHAR(64) NOT NULL UNIQUE,
+            userid INTEGER,
+            revoked_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            expires_at TIMESTAMPTZ
+        )
+    """)
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS revoked_tokens")
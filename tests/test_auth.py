@@ -0,0 +1,35 @@
+# test_auth.py
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token, verify_jwt_in_request
+
+from app import auth
+
+
+def _request_with_claims(claims):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key-of-at-least-32-bytes'
+    JWTManager(app)
+    with app.app_context():
+        token = create_access_token(identity='supplier@example.com', additional_claims=claims)
+    context = app.test_request_context(headers={'Authorization': f'Bearer {token}'})
+    context.push()
+    verify_jwt_in_request()
+    return context
+
+
+def test_supplier_id_claim_is_used_when_set(monkeypatch):
+    monkeypatch.setattr(auth, 'get_supplier_id_by_email', lambda email: None)
+    context = _request_with_claims(auth.identity_claims('Supplier', 1, 7))
+    try:
+        assert auth.current_supplier_id() == 7
+    finally:
+        context.pop()
+
+
+def test_supplier_id_is_looked_up_when_the_claim_is_none(monkeypatch):
+    monkeypatch.setattr(auth, 'get_supplier_id_by_email', lambda email: 9 if email == 'supplier@example.com' else None)
+    context = _request_with_claims(auth.identity_claims('Client', 1, None))
+    try:
+        assert auth.current_supplier_id() == 9
+    finally:
+        context.pop()
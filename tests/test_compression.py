@@ -0,0 +1,50 @@
+# test_compression.py
+import pytest
+from flask import Flask
+
+from app.compression import COMPRESS_MIN_SIZE, CatalogSnapshot, PrecompressedPayload
+
+
+def test_small_payload_is_sent_uncompressed_to_gzip_clients():
+    app = Flask(__name__)
+    payload = PrecompressedPayload(b'[]', 'application/json', 'catalog-1')
+
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip, deflate, br'}):
+        response = payload.response()
+
+    assert response.status_code == 200
+    assert response.get_data() == b'[]'
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_large_payload_is_sent_in_the_negotiated_coding():
+    app = Flask(__name__)
+    payload = PrecompressedPayload(b'x' * COMPRESS_MIN_SIZE, 'application/json', 'catalog-1')
+
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = payload.response()
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.get_data() == payload.bodies['gzip']
+
+
+def test_small_snapshot_is_served_to_gzip_clients(monkeypatch):
+    monkeypatch.setattr('app.compression.get_catalog_version', lambda: 1)
+    app = Flask(__name__)
+    snapshot = CatalogSnapshot('bootstrap', lambda: {'event_types': [], 'venues': []})
+
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = snapshot.payload().response()
+
+    assert response.status_code == 200
+    assert response.get_data() == b'{"event_types":[],"venues":[]}'
+    assert response.headers['ETag'] == 'W/"bootstrap-1"'
+
+
+def test_snapshot_build_errors_are_raised_by_payload(monkeypatch):
+    monkeypatch.setattr('app.compression.get_catalog_version', lambda: 1)
+    snapshot = CatalogSnapshot('bootstrap', lambda: 1 / 0)
+
+    with pytest.raises(ZeroDivisionError):
+        snapshot.payload()
+    assert snapshot.stats()['version'] is None
@@ -0,0 +1,73 @@
+# test_models.py
+from app import models
+
+
+class FakeCursor:
+    def __init__(self, row):
+        self.row = row
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, row):
+        self.row = row
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self.row)
+
+    def close(self):
+        self.closed = True
+
+
+def test_check_user_verifies_unknown_users_against_a_dummy_hash(monkeypatch):
+    conn = FakeConnection(None)
+    verified = []
+
+    def verify_password(password, stored_hash):
+        verified.append((stored_hash, conn.closed))
+        return False, False
+
+    monkeypatch.setattr(models, 'get_db_connection', lambda: conn)
+    monkeypatch.setattr(models, 'verify_password', verify_password)
+
+    assert models.check_user('nobody@example.com', 'secret') == (False, None, None, None)
+    assert verified == [(models.dummy_password_hash(), True)]
+
+
+def test_bulk_create_users_skips_rows_with_a_non_string_password_hash(monkeypatch):
+    executed = []
+
+    class ImportCursor(FakeCursor):
+        def execute(self, query, params=None, stream=None):
+            if stream is not None:
+                executed.append(stream.getvalue())
+
+        def fetchall(self):
+            return [('b@example.com',)]
+
+    class ImportConnection(FakeConnection):
+        def cursor(self):
+            return ImportCursor(None)
+
+        def commit(self):
+            pass
+
+    monkeypatch.setattr(models, 'get_db_connection', lambda: ImportConnection(None))
+    monkeypatch.setattr(models, 'hash_passwords', lambda passwords: ['$2b$12$hash' for _ in passwords])
+    user = {'firstname': 'F', 'lastname': 'L', 'contactnumber': '1'}
+    users = [
+        dict(user, username='a', email='a@example.com', password_hash=12345),
+        dict(user, username='b', email='b@example.com', password='secret')
+    ]
+
+    assert models.bulk_create_users(users) == (['b@example.com'], ['a@example.com'])
+    assert 'a@example.com' not in executed[0]
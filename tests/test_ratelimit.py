@@ -0,0 +1,19 @@
+# test_ratelimit.py
+from app.ratelimit import MemoryBackend, SlidingWindowLimiter
+
+
+def test_limit_is_enforced_within_the_window():
+    limiter = SlidingWindowLimiter('test', 2, 60, MemoryBackend())
+
+    assert limiter.hit('a') == (True, 0)
+    assert limiter.hit('a') == (True, 0)
+    allowed, retry_after = limiter.hit('a')
+    assert not allowed and 1 <= retry_after <= 120
+    assert limiter.hit('b') == (True, 0)
+
+
+def test_zero_limit_rejects_with_a_retry_after():
+    limiter = SlidingWindowLimiter('test', 0, 60, MemoryBackend())
+
+    allowed, retry_after = limiter.hit('a')
+    assert not allowed and 1 <= retry_after <= 60